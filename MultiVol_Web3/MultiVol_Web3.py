@@ -1,15 +1,22 @@
 # main file
 from __future__ import annotations
+import asyncio
+import json
 import logging
 from typing import Iterable, Optional
 import reflex as rx
+from reflex.utils.format import format_queue_events
 import random
 from pathlib import Path
 from .cases_management.cases import cases
 from .investigations.investigation import table
 from .profiles import index_profiles
 from .investigations.investigation import TableState
-from .cases_management.handle_case import after_upload
+from .investigations import memory
+from .api import api
+from .cases_management import jobs, result_cache, tiering, trash
+from .cases_management.watcher import watch_cases
+from .uploads import dropdir, resumable
 from .templates.navbar import sidebar
 from .templates.spline_func import _spline_background
 BG = "#0b0d0f"
@@ -19,6 +26,10 @@ TEXT = "#d3d6db"
 MUTED = "#8b9097"
 ACCENT = "#a200ff"
 
+DUMP_INPUT_ID = "dump-input"
+# chunks of one file uploaded at the same time
+PARALLEL_CHUNKS = 4
+
 def _make_logger(name: str, logfile: str) -> logging.Logger:
     logger = logging.getLogger(name)
     logger.setLevel(logging.INFO)
@@ -111,6 +122,13 @@ class State(rx.State):
     case_name: str = ""
     case_description: str = ""
     log_tick: int = 0
+    jobs: list[dict[str, str]] = []
+    polling_jobs: bool = False
+    upload_ids: list[str] = []
+    selected_files: list[str] = []
+    drop_enabled: bool = False
+    drop_imports: list[dict[str, str]] = []
+    drop_selected: list[str] = []
 
     def change_value(self):
         self.value = random.choice(self.os_values)
@@ -118,48 +136,168 @@ class State(rx.State):
     def set_os_value(self, v: str):
         self.os_value = v
 
-    async def handle_upload(self, files: list[rx.UploadFile]):
+    def refresh_selected_files(self, _value: str = ""):
+        # The input's value is a fake path; ask the browser for the picked files instead
+        return rx.call_script(
+            f"window.multivolSelectedFiles({json.dumps(DUMP_INPUT_ID)})",
+            callback=State.set_selected_files,
+        )
+
+    def set_selected_files(self, files: list[dict]):
+        self.selected_files = [f["name"] for f in files or []]
+
+    def clear_selection(self):
+        self.selected_files = []
+        return rx.call_script(f"document.getElementById({json.dumps(DUMP_INPUT_ID)}).value = ''")
+
+    def start_upload(self):
+        # The browser reads the picked files; sessions are opened once we know their names/sizes
+        return rx.call_script(
+            f"window.multivolSelectedFiles({json.dumps(DUMP_INPUT_ID)})",
+            callback=State.open_upload_sessions,
+        )
+
+    async def open_upload_sessions(self, files: list[dict]):
+        self.set_selected_files(files)
+        if not files:
+            self.log_append("[upload] no file selected")
+            return
+        if self.uploading:
+            return
+        sessions = []
+        try:
+            for f in files:
+                session = resumable.open_session(f["name"], int(f["size"]), f.get("last_modified"))
+                session["client_name"] = f["name"]
+                if session["received"]:
+                    self.log_append(f"[upload] resuming {session['name']} ({len(session['received'])}/{session['chunks']} chunks already on the server)")
+                sessions.append(session)
+        except Exception as e:
+            self.log_append(f"[upload] error: {e}")
+            return
+        self.upload_ids = [s["id"] for s in sessions]
+        self.uploading = True
+        self.show_progress = True
+        self.progress = 0
+        api_url = rx.config.get_config().api_url.rstrip("/")
+        # Not a call_script callback: that would keep every other event (progress included)
+        # waiting for the whole transfer. The script returns at once and queues finish_upload.
+        on_done = format_queue_events(State.finish_upload, args_spec=lambda result: [result])
+        yield rx.call_script(
+            f"window.multivolResumableUpload({json.dumps(api_url)}, {json.dumps(DUMP_INPUT_ID)}, "
+            f"{json.dumps(sessions)}, {PARALLEL_CHUNKS}, {on_done})"
+        )
+        yield State.poll_upload_progress
+
+    @rx.event(background=True)
+    async def poll_upload_progress(self):
+        # Progress comes from the server-side session status, not from the browser
+        while True:
+            async with self:
+                if not self.uploading:
+                    return
+                ids = list(self.upload_ids)
+            received = total = 0
+            for upload_id in ids:
+                try:
+                    st = resumable.status(upload_id)
+                except resumable.UploadError:
+                    continue
+                received += st["received_bytes"]
+                total += st["size"]
+            async with self:
+                if total:
+                    self.progress = min(99, round(received * 100 / total))
+            await asyncio.sleep(1)
+
+    async def finish_upload(self, result: dict):
+        self.uploading = False
+        if not result or not result.get("ok"):
+            self.log_append(f"[upload] interrupted: {(result or {}).get('error', 'unknown error')} - upload again to resume")
+            return
         self.log_append(f"[CASE-CREATION] The case '{self.case_name or '(empty)'}' with os '{self.os_value}' was just created.")
         yield
 
         saved_batch: list[str] = []
-        for file in files:
-            data = await file.read()
-            path = rx.get_upload_dir() / file.name
-            with path.open("wb") as f:
-                f.write(data)
-            self.uploaded.append(file.name)
-            saved_batch.append(file.name)
-
         try:
+            for upload_id in self.upload_ids:
+                stored = await resumable.complete(upload_id)
+                if stored.deduplicated:
+                    self.log_append(f"[upload] {stored.path.name} matches an already uploaded dump (sha256 {stored.sha256[:12]}…), reusing it")
+                self.uploaded.append(stored.path.name)
+                saved_batch.append(stored.path.name)
+            self.upload_ids = []
+            self.progress = 100
+
             upload_dir = rx.get_upload_dir()
             paths = [str(upload_dir / name) for name in saved_batch]
-
-            async for _ in after_upload(
-                self,
-                paths,
-                self.case_name,
-                self.os_value,
-                self.mode_value
-            ):
-                yield
-
-            self.log_append(f"[post] processed {len(saved_batch)} file(s)")
-            yield
+            job_id = jobs.enqueue(self.case_name, self.os_value, self.mode_value, paths)
+            self.log_append(f"[post] queued {len(saved_batch)} file(s) as job {job_id}")
+            yield State.poll_jobs
         except Exception as e:
             self.log_append(f"[post] error: {e}")
             yield
 
-
-    def handle_upload_progress(self, progress: dict):
-        self.uploading = True
-        self.show_progress = True
+    def load_drop_imports(self):
+        self.drop_enabled = dropdir.drop_dir() is not None
+        self.drop_imports = dropdir.list_imports() if self.drop_enabled else []
+        names = {d["name"] for d in self.drop_imports}
+        self.drop_selected = [n for n in self.drop_selected if n in names]
+
+    def toggle_drop_import(self, name: str):
+        if name in self.drop_selected:
+            self.drop_selected = [n for n in self.drop_selected if n != name]
+        else:
+            self.drop_selected = self.drop_selected + [name]
+
+    def create_case_from_drop(self):
+        # Imported dumps are read in place, nothing to upload
+        if not self.drop_selected:
+            self.log_append("[import] no imported dump selected")
+            return
+        self.log_append(f"[CASE-CREATION] The case '{self.case_name or '(empty)'}' with os '{self.os_value}' was just created.")
+        upload_dir = rx.get_upload_dir()
+        paths = [str(upload_dir / name) for name in self.drop_selected]
         try:
-            self.progress = round(progress["progress"] * 100)
-        except Exception:
-            self.progress = 0
-        if self.progress >= 100:
-            self.uploading = False
+            job_id = jobs.enqueue(self.case_name, self.os_value, self.mode_value, paths)
+        except Exception as e:
+            self.log_append(f"[import] error: {e}")
+            return
+        self.log_append(f"[import] queued {len(paths)} imported dump(s) as job {job_id}")
+        self.drop_selected = []
+        return State.poll_jobs
+
+    @rx.event(background=True)
+    async def poll_jobs(self):
+        # The analysis runs in the job workers; the page only follows its status
+        async with self:
+            if self.polling_jobs:
+                return
+            self.polling_jobs = True
+        try:
+            while True:
+                recent = await asyncio.to_thread(jobs.list_jobs)
+                active = any(j["status"] in (jobs.QUEUED, jobs.RUNNING) for j in recent)
+                async with self:
+                    self.jobs = [
+                        {
+                            "id": str(j["id"]),
+                            "case_name": j["case_name"],
+                            "os": j["os"],
+                            "status": j["status"],
+                            "attempts": str(j["attempts"]),
+                            "error": j["error"],
+                        }
+                        for j in recent
+                    ]
+                    self.log_tick += 1
+                if not active:
+                    break
+                await asyncio.sleep(2)
+        finally:
+            async with self:
+                self.polling_jobs = False
+
 
     def clear_log(self):
         open("app.log", "w", encoding="utf-8").close()
@@ -235,9 +373,45 @@ def terminal_box() -> rx.Component:
         id="log",
     )
 
-def upload_panel() -> rx.Component:
-    selected = rx.selected_files("uploader")
+def jobs_box() -> rx.Component:
+    STATUS_COLORS = {"queued": MUTED, "running": ACCENT, "done": "#3fb950", "failed": "#ff6b70"}
+    return rx.box(
+        rx.text(
+            "Analysis Jobs",
+            style={"color": MUTED, "textTransform": "uppercase", "fontSize": "12px", "letterSpacing": "1px", "marginBottom": "8px"},
+        ),
+        rx.cond(
+            State.jobs.length() > 0,
+            rx.vstack(
+                rx.foreach(
+                    State.jobs,
+                    lambda job: rx.hstack(
+                        rx.text("#", job["id"], size="2", style={"color": MUTED, "minWidth": "48px"}),
+                        rx.text(job["case_name"], size="2", style={"color": TEXT, "flex": 1, "overflow": "hidden", "textOverflow": "ellipsis", "whiteSpace": "nowrap"}),
+                        rx.text(job["os"], size="2", style={"color": MUTED}),
+                        rx.text(
+                            job["status"],
+                            size="2",
+                            weight="bold",
+                            style={"color": rx.match(job["status"], *STATUS_COLORS.items(), MUTED), "textTransform": "uppercase", "minWidth": "80px", "textAlign": "right"},
+                        ),
+                        title=job["error"],
+                        spacing="3",
+                        align_items="center",
+                        width="100%",
+                    ),
+                ),
+                spacing="2",
+                align_items="stretch",
+                width="100%",
+                style={"padding": "10px", "background": PANEL, "border": f"1px solid {EDGE}", "borderRadius": "8px"},
+            ),
+            rx.text("No analysis queued.", size="2", style={"color": MUTED}),
+        ),
+        on_mount=State.poll_jobs,
+    )
 
+def upload_panel() -> rx.Component:
     # --- Design tokens (px values OK for styles, NOT for `spacing`)
     CARD_MAX_W = "760px"
     GAP_SM = "10px"
@@ -287,21 +461,29 @@ def upload_panel() -> rx.Component:
             # Upload
             section_title("Upload"),
             rx.vstack(
-                rx.upload(
+                rx.el.label(
                     rx.vstack(
-                        rx.text("Drop files here", weight="bold", style={"color": TEXT}),
-                        rx.text("or click to browse", size="2", style={"color": MUTED}),
+                        rx.text("Choose memory dumps", weight="bold", style={"color": TEXT}),
+                        rx.text("interrupted uploads resume where they stopped", size="2", style={"color": MUTED}),
+                        rx.el.input(
+                            type="file",
+                            id=DUMP_INPUT_ID,
+                            multiple=True,
+                            on_change=State.refresh_selected_files,
+                            style={"color": TEXT, "fontSize": "12px", "marginTop": "8px", "maxWidth": "100%"},
+                        ),
                         spacing="1",
                         align_items="center",
                     ),
-                    id="uploader",
-                    multiple=True,
+                    html_for=DUMP_INPUT_ID,
                     style={
                         **FIELD,
+                        "display": "block",
                         "width": "100%",
                         "padding": "20px",
                         "borderStyle": "dashed",
                         "textAlign": "center",
+                        "cursor": "pointer",
                         "transition": "border-color .15s ease, box-shadow .15s ease",
                         "boxShadow": "inset 0 1px 0 rgba(255,255,255,.03)",
                     },
@@ -310,12 +492,8 @@ def upload_panel() -> rx.Component:
                 rx.hstack(
                     rx.button(
                         "Upload",
-                        on_click=State.handle_upload(
-                            rx.upload_files(
-                                upload_id="uploader",
-                                on_upload_progress=State.handle_upload_progress,
-                            )
-                        ),
+                        on_click=State.start_upload,
+                        disabled=State.uploading,
                         style={
                             "border": f"1px solid {EDGE}",
                             "background": ACCENT,
@@ -329,7 +507,7 @@ def upload_panel() -> rx.Component:
                     ),
                     rx.button(
                         "Clear selection",
-                        on_click=rx.clear_selected_files("uploader"),
+                        on_click=State.clear_selection,
                         style={
                             "border": f"1px solid {EDGE}",
                             "background": "#14171b",
@@ -350,13 +528,13 @@ def upload_panel() -> rx.Component:
 
             # Selected files
             rx.cond(
-                selected.length() > 0,
+                State.selected_files.length() > 0,
                 rx.box(
                     rx.text("Selected files", style=LABEL),
                     rx.box(
                         rx.vstack(
                             rx.foreach(
-                                selected,
+                                State.selected_files,
                                 lambda f: rx.hstack(
                                     rx.box(style={"width": "6px", "height": "6px", "borderRadius": "999px", "background": ACCENT}),
                                     rx.text(
@@ -379,6 +557,68 @@ def upload_panel() -> rx.Component:
                 ),
             ),
 
+            # Dumps already on the server (DROP_DIR)
+            rx.cond(
+                State.drop_enabled,
+                rx.vstack(
+                    rx.hstack(
+                        rx.text("Or use dumps from the drop directory", size="2", weight="bold", style={"color": TEXT}),
+                        rx.spacer(),
+                        rx.button(
+                            "Refresh",
+                            on_click=State.load_drop_imports,
+                            size="1",
+                            style={"border": f"1px solid {EDGE}", "background": "#14171b", "color": TEXT, "borderRadius": RADIUS},
+                        ),
+                        width="100%",
+                        align_items="center",
+                    ),
+                    rx.cond(
+                        State.drop_imports.length() > 0,
+                        rx.vstack(
+                            rx.foreach(
+                                State.drop_imports,
+                                lambda d: rx.hstack(
+                                    rx.checkbox(
+                                        checked=State.drop_selected.contains(d["name"]),
+                                        on_change=lambda _: State.toggle_drop_import(d["name"]),
+                                        color_scheme="purple",
+                                    ),
+                                    rx.text(d["name"], size="2", title=d["path"], style={"color": TEXT, "flex": 1, "overflow": "hidden", "textOverflow": "ellipsis", "whiteSpace": "nowrap"}),
+                                    rx.text(d["size"], size="2", style={"color": MUTED}),
+                                    rx.text(rx.cond(d["sha256"] != "", "hashed", "hashing…"), size="2", title=d["sha256"], style={"color": MUTED, "minWidth": "70px", "textAlign": "right"}),
+                                    spacing="3",
+                                    align_items="center",
+                                    width="100%",
+                                ),
+                            ),
+                            spacing="2",
+                            width="100%",
+                            style={**FIELD, "padding": "10px 12px", "maxHeight": "220px", "overflowY": "auto"},
+                        ),
+                        rx.text("No dump in the drop directory yet.", size="2", style={"color": MUTED}),
+                    ),
+                    rx.button(
+                        "Create case from selected",
+                        on_click=State.create_case_from_drop,
+                        disabled=State.drop_selected.length() == 0,
+                        style={
+                            "border": f"1px solid {EDGE}",
+                            "background": ACCENT,
+                            "color": "#0b0d10",
+                            "borderRadius": RADIUS,
+                            "textTransform": "uppercase",
+                            "letterSpacing": ".5px",
+                            "padding": "10px 14px",
+                            "fontWeight": 600,
+                        },
+                    ),
+                    spacing="2",
+                    width="100%",
+                    style={"marginTop": GAP_SM},
+                ),
+            ),
+
             # Progress
             rx.cond(
                 State.show_progress,
@@ -483,6 +723,7 @@ def upload_panel() -> rx.Component:
             },
         ),
         style={"padding": "18px 10px"},
+        on_mount=State.load_drop_imports,
     )
 def index() -> rx.Component:
     return rx.box(
@@ -497,6 +738,7 @@ def index() -> rx.Component:
                     rx.vstack(
                         upload_panel(),
                         rx.box(height="16px"),
+                        jobs_box(),
                         terminal_box(),
                         spacing="6",
                         align_items="stretch",
@@ -531,9 +773,26 @@ app = rx.App(
         "https://fonts.googleapis.com/css2?family=IBM+Plex+Mono:wght@400;600&display=swap",
         "/style.css"
     ],
+    head_components=[rx.script(src="/resumable_upload.js"), rx.script(src="/case_import.js")],
+    api_transformer=api,
 )
 
 app.add_page(index, title="MultiVol")
 app.add_page(cases, route="/cases", title="Cases")
 app.add_page(table, route="/sheet", title="sheet",on_load=TableState.load_entries)
 app.add_page(index_profiles, route="/profiles", title="Profiles")
+
+# Analyses run in the job workers, not in the upload event handler
+app.register_lifespan_task(jobs.run_worker_pool)
+# Module outputs are ingested as soon as they are written
+app.register_lifespan_task(watch_cases)
+# Dumps dropped into DROP_DIR are registered (and hashed) in place
+app.register_lifespan_task(dropdir.watch_drop_dir)
+# Deleted cases are removed from disk in the background, at TRASH_RATE_MB
+app.register_lifespan_task(trash.purge_trash)
+# Cases idle for COLD_AFTER_DAYS are packed, and restored module by module when opened
+app.register_lifespan_task(tiering.tier_cases)
+# Loaded /sheet tables unused for TABLE_IDLE_MINUTES are dropped, and read again when needed
+app.register_lifespan_task(memory.sweep_idle)
+# Cached plugin outputs of deleted cases are kept under RESULT_CACHE_GB
+app.register_lifespan_task(result_cache.prune_result_cache)
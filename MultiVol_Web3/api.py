@@ -0,0 +1,10 @@
+# api.py
+# Plain HTTP endpoints mounted next to the Reflex backend: big transfers must not go through the
+# websocket (or Reflex's buffered /_upload route).
+from starlette.applications import Starlette
+
+from .cases_management import case_import, export
+from .investigations import memory
+from .uploads import resumable
+
+api = Starlette(routes=[*resumable.routes, *export.routes, *case_import.routes, *memory.routes])
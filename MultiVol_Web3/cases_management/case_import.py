@@ -0,0 +1,278 @@
+# case_import.py
+# The way back from export.py: a case archive (tar.zst, tar, tar.gz or zip) POSTed as the raw
+# request body is extracted while it arrives. Every member path is validated (one top-level case
+# folder, no absolute paths, no `..`, no links or devices), files land in a staging folder under
+# cases/.import and the finished case is renamed into cases/ in one step, so neither the watcher
+# nor the catalog ever see half a case. Module outputs are summarized as they are written (page
+# cache still hot) and the manifest is written before the rename: the imported case is browsable
+# right away, without a rescan or a re-parse of its outputs.
+from __future__ import annotations
+
+import asyncio
+import gzip
+import logging
+import os
+import queue
+import shutil
+import tarfile
+import time
+import zipfile
+import zlib
+from pathlib import Path, PurePosixPath
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from . import catalog, tiering, trash
+from .export import CASES_DIR, READ_CHUNK, zstd_available
+from .manifest import (
+    MANIFEST_NAME, MANIFEST_VERSION, OUTPUT_DIR, OUTPUT_SUFFIX, _plugin_runtime, _write_manifest, summarize_output,
+)
+from .outputs import compress_output
+
+logger = logging.getLogger(__name__)
+
+STAGING_DIR = CASES_DIR / ".import"
+# request body chunks buffered between the event loop and the extracting thread
+PIPE_DEPTH = 64
+
+# (member name, is_dir, mtime, content or None for folders)
+_Member = Tuple[str, bool, float, Optional[BinaryIO]]
+
+
+class CaseImportError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def archive_format(filename: str) -> Optional[str]:
+    name = filename.lower()
+    for suffix, fmt in ((".tar.zst", "tar.zst"), (".tzst", "tar.zst"), (".tar.gz", "tar.gz"),
+                        (".tgz", "tar.gz"), (".tar", "tar"), (".zip", "zip")):
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+class _BodyPipe:
+    """Blocking file-like read() over the request body chunks pushed by the event loop."""
+
+    def __init__(self) -> None:
+        self._queue: "queue.Queue[Optional[bytes]]" = queue.Queue(PIPE_DEPTH)
+        self._buf = bytearray()
+        self._eof = False
+        self.closed = False  # set by the reader when it gave up: further chunks are dropped
+
+    def try_put(self, chunk: Optional[bytes]) -> bool:
+        if self.closed:
+            return True
+        try:
+            self._queue.put_nowait(chunk)
+            return True
+        except queue.Full:
+            return False
+
+    def put(self, chunk: Optional[bytes]) -> None:
+        while not self.closed:
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def abort(self) -> None:
+        # the body will never complete: wake a reader waiting for more
+        self.closed = True
+        try:
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+
+    def read(self, n: int = -1) -> bytes:
+        while not self._eof and (n < 0 or len(self._buf) < n):
+            chunk = self._queue.get()
+            if chunk is None:
+                self._eof = True
+            else:
+                self._buf += chunk
+        size = len(self._buf) if n < 0 else min(n, len(self._buf))
+        data = bytes(self._buf[:size])
+        del self._buf[:size]
+        return data
+
+
+def _safe_parts(name: str) -> Tuple[str, ...]:
+    if "\\" in name or "\0" in name:
+        raise CaseImportError(f"invalid member name: {name!r}")
+    path = PurePosixPath(name)
+    parts = tuple(p for p in path.parts if p not in ("", "."))
+    if path.is_absolute() or not parts or ".." in parts:
+        raise CaseImportError(f"unsafe member path: {name!r}")
+    if parts[0].startswith("."):
+        raise CaseImportError(f"not a case folder: {parts[0]!r}")
+    return parts
+
+
+def _tar_members(fileobj: BinaryIO, mode: str) -> Iterator[_Member]:
+    # "r|": sequential, never seeks, so it works straight off the request body
+    with tarfile.open(fileobj=fileobj, mode=mode) as tar:
+        for member in tar:
+            if member.isdir():
+                yield member.name, True, member.mtime, None
+            elif member.isfile():
+                yield member.name, False, member.mtime, tar.extractfile(member)
+            else:
+                raise CaseImportError(f"links and special files are not allowed: {member.name!r}")
+
+
+def _zip_members(path: Path) -> Iterator[_Member]:
+    # the zip directory sits at the end: zips are spooled first, then read in archive order
+    with zipfile.ZipFile(path) as zf:
+        for info in zf.infolist():
+            mode = info.external_attr >> 16
+            if mode and (mode & 0o170000) not in (0, 0o100000, 0o040000):
+                raise CaseImportError(f"links and special files are not allowed: {info.filename!r}")
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            if info.is_dir():
+                yield info.filename, True, mtime, None
+            else:
+                with zf.open(info) as f:
+                    yield info.filename, False, mtime, f
+
+
+def _extract(members: Iterator[_Member], staging: Path) -> str:
+    """Write `members` under `staging`, summarizing module outputs; returns the case folder name."""
+    top: Optional[str] = None
+    modules: Dict[str, Dict[str, Any]] = {}
+    for name, is_dir, mtime, content in members:
+        parts = _safe_parts(name)
+        if top is None:
+            top = parts[0]
+        elif parts[0] != top:
+            raise CaseImportError("the archive must hold a single case folder")
+        dest = staging.joinpath(*parts)
+        if is_dir:
+            dest.mkdir(parents=True, exist_ok=True)
+            continue
+        if len(parts) == 2 and parts[1] == MANIFEST_NAME:
+            # rebuilt below from what is actually extracted
+            continue
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with dest.open("wb") as f:
+            shutil.copyfileobj(content, f, READ_CHUNK)
+        os.utime(dest, (mtime, mtime))
+        if len(parts) == 3 and parts[1] == OUTPUT_DIR and parts[2].endswith(OUTPUT_SUFFIX):
+            compress_output(dest)
+            modules[parts[2]] = summarize_output(dest)
+    if top is None:
+        raise CaseImportError("the archive is empty")
+    case_dir = staging / top
+    if not (case_dir / "case_details.json").is_file():
+        raise CaseImportError("not a case archive (no case_details.json)")
+    # runtimes come from plugin_runs.json, which may have been extracted after some outputs
+    for entry in modules.values():
+        if entry["runtime"] is None:
+            entry["runtime"] = _plugin_runtime(case_dir, entry["file"])
+    _write_manifest(case_dir, {"version": MANIFEST_VERSION, "case": top, "modules": modules})
+    return top
+
+
+def _publish(staging: Path, top: str) -> str:
+    target = CASES_DIR / top
+    if target.exists():
+        raise CaseImportError(f"case {top!r} already exists", status=409)
+    # same filesystem: one rename, the case appears complete
+    os.replace(staging / top, target)
+    # counts as an access: old cases aren't packed away (tiering.py) as soon as they arrive
+    tiering.touch(target)
+    catalog.mark_dirty(top)
+    return top
+
+
+def import_stream(fileobj: BinaryIO, fmt: str) -> str:
+    """Extract a tar-family archive read from `fileobj` into cases/; returns the case folder."""
+    staging = STAGING_DIR / uuid4().hex
+    staging.mkdir(parents=True)
+    corrupt: Tuple[type, ...] = (tarfile.TarError, EOFError, zlib.error, gzip.BadGzipFile)
+    try:
+        if fmt == "tar.zst":
+            import zstandard
+
+            corrupt += (zstandard.ZstdError,)
+            reader = zstandard.ZstdDecompressor().stream_reader(fileobj, read_size=READ_CHUNK)
+            top = _extract(_tar_members(reader, "r|"), staging)
+        else:
+            top = _extract(_tar_members(fileobj, "r|gz" if fmt == "tar.gz" else "r|"), staging)
+        return _publish(staging, top)
+    except corrupt as e:
+        raise CaseImportError(f"corrupt archive: {e}")
+    finally:
+        # done reading, for good or not: a writer blocked on a full pipe must not wait forever
+        if isinstance(fileobj, _BodyPipe):
+            fileobj.abort()
+        trash.move_to_trash(staging)
+
+
+def import_zip(path: Path) -> str:
+    staging = STAGING_DIR / uuid4().hex
+    staging.mkdir(parents=True)
+    try:
+        return _publish(staging, _extract(_zip_members(path), staging))
+    except (zipfile.BadZipFile, EOFError) as e:
+        raise CaseImportError(f"corrupt archive: {e}")
+    finally:
+        trash.move_to_trash(staging)
+
+
+async def _import_tar(request: Request, fmt: str) -> str:
+    pipe = _BodyPipe()
+    task = asyncio.ensure_future(asyncio.to_thread(import_stream, pipe, fmt))
+    try:
+        async for chunk in request.stream():
+            if task.done():
+                # rejected early (bad path...): stop reading the body
+                break
+            if chunk and not pipe.try_put(chunk):
+                await asyncio.to_thread(pipe.put, chunk)
+        if not pipe.try_put(None):
+            await asyncio.to_thread(pipe.put, None)
+        return await task
+    finally:
+        pipe.abort()
+
+
+async def _import_zip(request: Request) -> str:
+    STAGING_DIR.mkdir(parents=True, exist_ok=True)
+    spool = STAGING_DIR / f"{uuid4().hex}.zip"
+    try:
+        with spool.open("wb") as f:
+            async for chunk in request.stream():
+                await asyncio.to_thread(f.write, chunk)
+        return await asyncio.to_thread(import_zip, spool)
+    finally:
+        spool.unlink(missing_ok=True)
+
+
+async def _import(request: Request):
+    filename = request.query_params.get("filename", "")
+    fmt = archive_format(filename)
+    if fmt is None:
+        return JSONResponse({"error": f"unsupported archive: {filename!r}"}, status_code=415)
+    if fmt == "tar.zst" and not zstd_available():
+        return JSONResponse({"error": "zstandard is not installed"}, status_code=501)
+    try:
+        folder = await (_import_zip(request) if fmt == "zip" else _import_tar(request, fmt))
+    except CaseImportError as e:
+        logger.warning("Case import of %s rejected: %s", filename, e)
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+    logger.info("Imported case %s from %s", folder, filename)
+    return JSONResponse({"case": folder})
+
+
+routes: List[Route] = [
+    Route("/api/cases/import", _import, methods=["POST"]),
+]
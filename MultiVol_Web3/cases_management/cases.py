@@ -1,18 +1,20 @@
 # cases.py
+import asyncio
 import reflex as rx
 from pathlib import Path
-import os, json, glob
-from typing import Any, List, Dict
-import shutil
+import os, json, time
+from typing import Any, List, Dict, Optional, Tuple
 from ..templates.spline_func import _spline_background
 from ..templates.navbar import sidebar
-from uuid import uuid4
+from . import catalog, export, trash
+from urllib.parse import quote
 
 BG = "#0b0d0f"
 PANEL = "#121417"
 EDGE = "#272b31"
 TEXT = "#d3d6db"
 MUTED = "#8b9097"
+IMPORT_INPUT_ID = "case-import-input"
 
 
 class Check(rx.Base):
@@ -29,102 +31,49 @@ class CaseCardData(rx.Base):
     slug: str
     avatar_src: str
     sheet_href: str
-    checks: List[Check] = []
+    created: str = ""
+    module_count: int = 0
+    failures: int = 0
+    checks: List[Check] = []  # only filled for expanded cards
 
 
 def _slug(s: str) -> str:
     return s.replace(" ", "_")
 
 
-def _json_failure_flag(data: Any) -> bool:
-    if data == 0:
-        return True
-    """Best-effort failure flag (handles dicts & lists)."""
-    if isinstance(data, dict):
-        if isinstance(data.get("failure"), bool):
-            return bool(data["failure"])
-        if data.get("status") in {"failed", "error"}:
-            return True
-        if any(k in data for k in ("error", "traceback", "exception")):
-            return True
-        return False
-    if isinstance(data, list):
-        for item in data:
-            if isinstance(item, dict):
-                if item.get("failure") is True:
-                    return True
-                if item.get("status") in {"failed", "error"}:
-                    return True
-                if any(k in item for k in ("error", "traceback", "exception")):
-                    return True
-        return False
-    return False
-
-
-def _label_from_filename(f: str) -> str:
-    name = Path(f).name
-    suffix = "_output.json"
-    if name.endswith(suffix):
-        base = name[: -len(suffix)]
-        # take the segment after the last '.' if present
-        if "." in base:
-            return base.split(".")[-1]
-    return Path(f).stem
+# -------------------- MODULE LIST PER-OS --------------------
 
+def _plugin_label(module: Dict[str, Any]) -> str:
+    # cases of several dumps have one output per dump, labelled <plugin>@<dump> in older manifests
+    return module["label"].split("@", 1)[0]
 
-# -------------------- MODULE LIST PER-OS --------------------
 
-def _collect_module_labels_by_os(cases_dir: Path) -> Dict[str, List[str]]:
+def _collect_module_labels_by_os(cases_found: List[Dict[str, Any]]) -> Dict[str, List[str]]:
     """
     Build a dict: os_slug -> sorted list of module labels,
-    collecting from each case's volatility3_output but only grouped by that case's OS.
+    collecting from each case's manifest but only grouped by that case's OS.
     """
     labels_by_os: Dict[str, set] = {}
 
-    for entry in os.scandir(cases_dir):
-        if not entry.is_dir():
-            continue
-
-        folder = Path(entry.path)
-        details_path = folder / "case_details.json"
-        if not details_path.exists():
-            continue
-
-        try:
-            with open(details_path, "r", encoding="utf-8") as f:
-                os_name = str(json.load(f).get("case_os", "Unknown"))
-        except Exception:
-            os_name = "Unknown"
-
-        os_slug = os_name.lower()
+    for case in cases_found:
+        os_slug = str(case["details"].get("case_os", "Unknown")).lower()
         labels_set = labels_by_os.setdefault(os_slug, set())
-
-        out_dir = folder / "volatility3_output"
-        if out_dir.exists():
-            for f in glob.glob(str(out_dir / "*.json"), recursive=True):
-                labels_set.add(_label_from_filename(f))
+        for module in case["modules"].values():
+            labels_set.add(_plugin_label(module))
 
     # sort lists for stable display order
     return {k: sorted(v) for k, v in labels_by_os.items()}
 
 
-def _get_case_checks_from_master(folder: Path, module_labels: List[str]) -> List[Check]:
+def _get_case_checks_from_master(modules: Dict[str, Any], module_labels: List[str]) -> List[Check]:
     """
-    For a given case folder, return checks in the SAME order as module_labels.
+    For a given case's manifest modules, return checks in the SAME order as module_labels.
     If a module is missing in this case, mark it as missing=True (not a failure).
     """
-    out_dir = folder / "volatility3_output"
-    present = {}
-
-    if out_dir.exists():
-        files = sorted(glob.glob(str(out_dir / "*.json"), recursive=True))
-        for f in files:
-            try:
-                with open(f, "r", encoding="utf-8") as fp:
-                    data = json.load(fp)
-                    present[_label_from_filename(f)] = _json_failure_flag(data)  # True means error
-            except Exception:
-                present[_label_from_filename(f)] = _json_failure_flag(0)  # treat as error
+    present: Dict[str, bool] = {}  # True means error (on any of the case's dumps)
+    for m in modules.values():
+        label = _plugin_label(m)
+        present[label] = present.get(label, False) or m["status"] == "failed"
 
     checks: List[Check] = []
     for label in module_labels:
@@ -139,59 +88,180 @@ def _get_case_checks_from_master(folder: Path, module_labels: List[str]) -> List
 # ----------------------------------------------------------------------
 
 
-def _gather_cases() -> List[CaseCardData]:
-    """Build a list of cases with all UI-ready fields precomputed."""
-    cases_dir = Path(__file__).parent.parent / "cases"
-
-    # Build per-OS canonical module lists once
-    module_labels_by_os = _collect_module_labels_by_os(cases_dir)
-
-    all_cases: List[CaseCardData] = []
-    for entry in os.scandir(cases_dir):
-        if not entry.is_dir():
-            continue
-
-        folder = Path(entry.path)
-        case_details_path = folder / "case_details.json"
-        if not case_details_path.exists():
-            continue
+SORT_KEYS = {
+    "date": lambda c: c["created"],
+    "os": lambda c: (str(c["details"].get("case_os", "")).lower(), c["folder"].lower()),
+    "name": lambda c: str(c["details"].get("case_name", c["folder"])).lower(),
+    "failures": lambda c: (c["failures"], c["folder"].lower()),
+}
+PAGE_SIZE = 24
+
+# catalog version -> per-OS module labels
+_labels_cache: Tuple[int, Dict[str, List[str]]] = (-1, {})
+
+
+def _card(case: Dict[str, Any], module_labels_by_os: Dict[str, List[str]], with_checks: bool) -> CaseCardData:
+    case_json = case["details"]
+
+    title = case_json.get("case_name", case["folder"])
+    desc = case_json.get("case_details", "")
+    os_name = case_json.get("case_os", "Unknown")
+    os_slug = str(os_name).lower()
+    slug = _slug(title)
+
+    # Use only the module labels for this case's OS
+    module_labels = module_labels_by_os.get(os_slug, [])
+
+    return CaseCardData(
+        title=title,
+        desc=desc,
+        os_name=os_name,
+        os_slug=os_slug,
+        slug=slug,
+        avatar_src=f"/{os_slug}.png",
+        sheet_href=f"/sheet?case={slug}",
+        created=time.strftime("%Y-%m-%d %H:%M", time.localtime(case["created"])),
+        module_count=len(case["modules"]),
+        failures=case["failures"],
+        checks=_get_case_checks_from_master(case["modules"], module_labels) if with_checks else [],
+    )
 
-        with open(case_details_path, "r", encoding="utf-8") as f:
-            case_json = json.load(f)
 
-        title = case_json.get("case_name", folder.name)
-        desc = case_json.get("case_details", "")
-        os_name = case_json.get("case_os", "Unknown")
-        os_slug = str(os_name).lower()
-        slug = _slug(title)
-
-        # Use only the module labels for this case's OS
-        module_labels = module_labels_by_os.get(os_slug, [])
-
-        all_cases.append(
-            CaseCardData(
-                title=title,
-                desc=desc,
-                os_name=os_name,
-                os_slug=os_slug,
-                slug=slug,
-                avatar_src=f"/{os_slug}.png",
-                sheet_href=f"/sheet?case={slug}",
-                checks=_get_case_checks_from_master(folder, module_labels),
-            )
-        )
+def _gather_cases(
+    search: str = "",
+    sort_by: str = "date",
+    descending: bool = True,
+    page: int = 0,
+    page_size: int = PAGE_SIZE,
+    expanded: Optional[List[str]] = None,
+) -> Tuple[int, List[CaseCardData]]:
+    """One page of cases from the in-memory catalog: (matching cases, cards of the page).
 
-    return all_cases
+    Checks are only built for the `expanded` slugs, the other cards carry counts.
+    """
+    global _labels_cache
+    version, cases_found = catalog.snapshot()
+    if _labels_cache[0] != version:
+        # Build per-OS canonical module lists once per catalog version
+        _labels_cache = (version, _collect_module_labels_by_os(cases_found))
+    module_labels_by_os = _labels_cache[1]
+
+    needle = search.strip().lower()
+    if needle:
+        cases_found = [
+            c for c in cases_found
+            if needle in str(c["details"].get("case_name", c["folder"])).lower()
+            or needle in str(c["details"].get("case_details", "")).lower()
+        ]
+    cases_found = sorted(cases_found, key=SORT_KEYS.get(sort_by, SORT_KEYS["date"]), reverse=descending)
+
+    expanded_set = set(expanded or [])
+    start = max(0, page) * page_size
+    cards = []
+    for case in cases_found[start:start + page_size]:
+        slug = _slug(str(case["details"].get("case_name", case["folder"])))
+        cards.append(_card(case, module_labels_by_os, slug in expanded_set))
+    return len(cases_found), cards
 
 
 # --- State: loads fresh cases on each page mount ---
 class CasesState(rx.State):
     cases: List[CaseCardData] = []
     menu_open_for: str = ""  # which card's menu is open (by title or slug)
+    scanning: bool = False
+    scan_done: int = 0
+    scan_total: int = 0
+    search: str = ""
+    sort_by: str = "date"
+    sort_values: List[str] = list(SORT_KEYS)
+    sort_desc: bool = True
+    page: int = 0
+    total: int = 0
+    expanded: List[str] = []  # slugs whose module checks are shown
+    importing: bool = False
+    import_message: str = ""
+
+    @rx.var
+    def page_count(self) -> int:
+        return max(1, -(-self.total // PAGE_SIZE))
+
+    @rx.event(background=True)
+    async def load(self):
+        # Called on page mount/refresh to repopulate cases. Normally an in-memory read; on a
+        # cold start the catalog is built off the event loop and its progress shown meanwhile.
+        async with self:
+            query = (self.search, self.sort_by, self.sort_desc, self.page, PAGE_SIZE, list(self.expanded))
+        task = asyncio.ensure_future(asyncio.to_thread(_gather_cases, *query))
+        while not task.done():
+            await asyncio.wait({task}, timeout=0.3)
+            progress = catalog.build_progress()
+            async with self:
+                self.scanning = progress is not None and not task.done()
+                if progress:
+                    self.scan_done, self.scan_total = progress
+        total, cards = task.result()
+        async with self:
+            self.total = total
+            self.cases = cards
+            self.scanning = False
+            # the page emptied (deletion): go to the last one
+            past_end = self.page > 0 and not cards
+            if past_end:
+                self.page = max(0, -(-total // PAGE_SIZE) - 1)
+        if past_end:
+            yield CasesState.load
+
+    def set_search(self, value: str):
+        self.search = value
+        self.page = 0
+        return CasesState.load
+
+    def set_sort_by(self, value: str):
+        self.sort_by = value
+        self.page = 0
+        return CasesState.load
+
+    def toggle_sort_desc(self):
+        self.sort_desc = not self.sort_desc
+        self.page = 0
+        return CasesState.load
+
+    def next_page(self):
+        if self.page + 1 < self.page_count:
+            self.page += 1
+            return CasesState.load
+
+    def prev_page(self):
+        if self.page > 0:
+            self.page -= 1
+            return CasesState.load
+
+    def toggle_expand(self, slug: str):
+        if slug in self.expanded:
+            self.expanded = [s for s in self.expanded if s != slug]
+        else:
+            self.expanded = self.expanded + [slug]
+        return CasesState.load
+
+    def start_import(self):
+        # The browser POSTs the archive to case_import.py, which extracts it while it arrives
+        if self.importing:
+            return
+        self.importing = True
+        self.import_message = "Importing…"
+        api_url = rx.config.get_config().api_url.rstrip("/")
+        return rx.call_script(
+            f"window.multivolImportCase({json.dumps(api_url)}, {json.dumps(IMPORT_INPUT_ID)})",
+            callback=CasesState.finish_import,
+        )
 
-    def load(self):
-        # Called on page mount/refresh to repopulate cases
-        self.cases = _gather_cases()
+    def finish_import(self, result: dict):
+        self.importing = False
+        if not result or not result.get("ok"):
+            self.import_message = f"Import failed: {(result or {}).get('error', 'unknown error')}"
+            return
+        self.import_message = f"Imported case {result.get('case', '')}"
+        return CasesState.load
 
     def toggle_menu(self, title: str):
         self.menu_open_for = "" if self.menu_open_for == title else title
@@ -206,35 +276,32 @@ class CasesState(rx.State):
         case_details_path = case_path / "case_details.json"
         # Verify if case_details exist as safety feature
         if case_details_path.exists():
-            shutil.rmtree(case_path)
+            # renamed into the trash right away, removed from disk by trash.purge_trash
+            trash.move_to_trash(case_path)
+            catalog.forget(slug)
+            export.drop_cached(slug)
             self.menu_open_for = ""
-            self.cases = _gather_cases()
+            return CasesState.load
 
     @rx.event
     def menu_download_zip(self, title: str):
-        # Hacky way of downloading files because apparently Reflex streams everything through the websocket 
-        # So we hit a size limitation and crash the backend ????????
+        return CasesState.menu_export(title, "zip")
+
+    @rx.event
+    def menu_export(self, title: str, fmt: str):
+        # The archive is streamed by a plain HTTP endpoint (export.py) while it is built:
+        # nothing goes through the websocket. fmt: "zip" or "tar.zst" (faster to unpack)
         slug = _slug(title)
-        base = Path(__file__).parent.parent
-        case_path = base / "cases" / slug
+        self.menu_open_for = ""
+        case_path = Path(__file__).parent.parent / "cases" / slug
         if (case_path / "case_details.json").exists():
-            # write the zip into Reflex's uploaded_files dir
-            name = f"{slug}-{uuid4().hex}.zip"
-            out_dir = rx.get_upload_dir()
-            out_dir.mkdir(parents=True, exist_ok=True)
-            base_name = out_dir / name
-            shutil.make_archive(
-                str(base_name.with_suffix("")),
-                "zip",
-                root_dir=case_path.parent,
-                base_dir=case_path.name,
-            )
-            # trigger a browser download via URL (served at /_upload/<name>)
-            url = rx.get_upload_url(name)
-            yield rx.download(url=url, filename=f"{slug}.zip")
-
-
-def case_card(title, desc, os_name, avatar_src, sheet_href, checks) -> rx.Component:
+            api_url = rx.config.get_config().api_url.rstrip("/")
+            url = f"{api_url}/api/cases/{quote(slug)}/{fmt}"
+            # Content-Disposition: attachment, the page stays where it is
+            return rx.call_script(f"window.location.href = {json.dumps(url)}")
+
+
+def case_card(title, desc, os_name, avatar_src, sheet_href, checks, slug, created, module_count, failures) -> rx.Component:
     """All inputs can be Vars; strings are precomputed to avoid concat."""
 
     def _check_item(chk):
@@ -305,11 +372,29 @@ def case_card(title, desc, os_name, avatar_src, sheet_href, checks) -> rx.Compon
                                     "wordBreak": "break-word",
                                 },
                             ),
-                            rx.text(os_name, size="1", style={"color": MUTED, "opacity": 0.8}),
+                            rx.text(os_name, " · ", created, size="1", style={"color": MUTED, "opacity": 0.8}),
                             spacing="1",
                             align_items="start",
                             style={"minWidth": 0},
                         ),
+                        rx.hstack(
+                            rx.text(
+                                module_count, " modules",
+                                rx.cond(failures > 0, rx.text.span(" · ", failures, " failed", style={"color": "#ff6b70"}), ""),
+                                size="1",
+                                style={"color": MUTED},
+                            ),
+                            rx.spacer(),
+                            rx.box(
+                                rx.cond(CasesState.expanded.contains(slug), "hide", "show"),
+                                on_click=CasesState.toggle_expand(slug).prevent_default.stop_propagation,
+                                role="button",
+                                style={"fontSize": "11px", "color": TEXT, "cursor": "pointer", "textDecoration": "underline", "position": "relative", "zIndex": 20},
+                            ),
+                            width="100%",
+                            align_items="center",
+                        ),
+                        # module checks are only sent for expanded cards
                         rx.box(
                             rx.list(
                                 rx.foreach(checks, _check_item),
@@ -423,6 +508,34 @@ def case_card(title, desc, os_name, avatar_src, sheet_href, checks) -> rx.Compon
                                     "border": f"1px solid {EDGE}",
                                 },
                             ),
+                            rx.button(
+                                "Export as tar.zst",
+                                on_click=CasesState.menu_export(title, "tar.zst").prevent_default,
+                                style={
+                                    "all": "unset",
+                                    "boxSizing": "border-box",
+                                    "display": "flex",
+                                    "alignItems": "center",
+                                    "justifyContent": "flex-start",
+                                    "gap": "8px",
+                                    "width": "100%",
+                                    "height": "32px",
+                                    "padding": "0 10px",
+                                    "borderRadius": "8px",
+                                    "cursor": "pointer",
+                                    "fontWeight": 600,
+                                    "fontSize": "12px",
+                                    "lineHeight": "1",
+                                    "textAlign": "left",
+                                    "color": TEXT,
+                                    "whiteSpace": "nowrap",
+                                    "overflow": "hidden",
+                                    "textOverflow": "ellipsis",
+                                    "margin": 0,
+                                    "background": "rgba(26,29,33,.6)",
+                                    "border": f"1px solid {EDGE}",
+                                },
+                            ),
                             rx.button(
                                 "Delete",
                                 on_click=CasesState.menu_delete(title),
@@ -496,6 +609,10 @@ def cases() -> rx.Component:
                 item.avatar_src,
                 item.sheet_href,
                 item.checks,
+                item.slug,
+                item.created,
+                item.module_count,
+                item.failures,
             ),
         ),
         style={
@@ -535,7 +652,80 @@ def cases() -> rx.Component:
                                 "marginBottom": "8px",
                             },
                         ),
+                        rx.cond(
+                            CasesState.scanning,
+                            rx.vstack(
+                                rx.text(
+                                    "Reading cases… ", CasesState.scan_done, " / ", CasesState.scan_total,
+                                    size="2",
+                                    style={"color": MUTED},
+                                ),
+                                rx.progress(
+                                    value=CasesState.scan_done,
+                                    max=rx.cond(CasesState.scan_total > 0, CasesState.scan_total, 1),
+                                    color_scheme="purple",
+                                    style={"width": "100%", "height": "6px"},
+                                ),
+                                spacing="2",
+                                width="100%",
+                            ),
+                        ),
+                        rx.hstack(
+                            rx.input(
+                                value=CasesState.search,
+                                on_change=CasesState.set_search.debounce(300),
+                                placeholder="Search name or description",
+                                style={"flex": 1, "background": "#0d0f12", "border": f"1px solid {EDGE}", "color": TEXT},
+                            ),
+                            rx.select(
+                                CasesState.sort_values,
+                                value=CasesState.sort_by,
+                                on_change=CasesState.set_sort_by,
+                            ),
+                            rx.button(
+                                rx.cond(CasesState.sort_desc, "↓", "↑"),
+                                on_click=CasesState.toggle_sort_desc,
+                                style={"border": f"1px solid {EDGE}", "background": "#14171b", "color": TEXT},
+                            ),
+                            spacing="2",
+                            width="100%",
+                            align_items="center",
+                        ),
+                        rx.hstack(
+                            rx.text("Import a case archive", size="2", style={"color": MUTED}),
+                            rx.el.input(
+                                type="file",
+                                id=IMPORT_INPUT_ID,
+                                accept=".zip,.tar,.tar.zst,.tzst,.tar.gz,.tgz",
+                                style={"color": TEXT, "fontSize": "12px", "maxWidth": "260px"},
+                            ),
+                            rx.button(
+                                "Import",
+                                on_click=CasesState.start_import,
+                                disabled=CasesState.importing,
+                                style={"border": f"1px solid {EDGE}", "background": "#14171b", "color": TEXT},
+                            ),
+                            rx.text(CasesState.import_message, size="2", style={"color": MUTED}),
+                            spacing="2",
+                            width="100%",
+                            align_items="center",
+                        ),
                         grid,
+                        rx.hstack(
+                            rx.button("‹", on_click=CasesState.prev_page, disabled=CasesState.page == 0,
+                                      style={"border": f"1px solid {EDGE}", "background": "#14171b", "color": TEXT}),
+                            rx.text(
+                                "Page ", CasesState.page + 1, " / ", CasesState.page_count, " · ", CasesState.total, " cases",
+                                size="2",
+                                style={"color": MUTED},
+                            ),
+                            rx.button("›", on_click=CasesState.next_page, disabled=CasesState.page + 1 >= CasesState.page_count,
+                                      style={"border": f"1px solid {EDGE}", "background": "#14171b", "color": TEXT}),
+                            spacing="3",
+                            justify="center",
+                            align_items="center",
+                            width="100%",
+                        ),
                         spacing="4",
                         align_items="stretch",
                         min_height="85vh",
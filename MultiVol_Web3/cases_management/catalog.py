@@ -0,0 +1,158 @@
+# catalog.py
+# In-memory catalog of the cases: built once (at startup by the watcher, or on first use) and
+# then kept current through per-case dirty flags set by the cases/ watcher, so the /cases page
+# reads memory instead of walking the cases directory on every mount. A full (re)build reads the
+# cases with a pool of I/O threads, which matters on cold starts over network storage.
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ..rxconfig import config
+from .manifest import refresh_manifest
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+
+_lock = threading.Lock()
+# case folder name -> {"folder", "details", "modules", "created", "failures"}
+_cases: Dict[str, Dict[str, Any]] = {}
+_dirty: Set[str] = set()
+_built = False
+_build_lock = threading.Lock()
+# (cases read, cases to read) of the running build, None when no build is running
+_progress: Optional[Tuple[int, int]] = None
+# bumped whenever the catalog content changes
+_version = 0
+
+
+def _load_case(folder: Path) -> Optional[Dict[str, Any]]:
+    """Catalog entry of one case folder, None when it isn't (or no longer is) a case."""
+    details_path = folder / "case_details.json"
+    if not details_path.exists():
+        return None
+    try:
+        with open(details_path, "r", encoding="utf-8") as f:
+            details = json.load(f)
+    except Exception:
+        details = {}
+    manifest = refresh_manifest(folder)
+    try:
+        created = float(details.get("created"))
+    except (TypeError, ValueError):
+        # cases from before the creation date was recorded
+        created = details_path.stat().st_mtime
+    return {
+        "folder": folder.name,
+        "details": details,
+        "modules": manifest["modules"],
+        "created": created,
+        "failures": sum(1 for m in manifest["modules"].values() if m["status"] == "failed"),
+    }
+
+
+def scan_workers() -> int:
+    try:
+        return max(1, int(getattr(config, "scan_workers", 16)))
+    except (TypeError, ValueError):
+        return 16
+
+
+def build_progress() -> Optional[Tuple[int, int]]:
+    return _progress
+
+
+def _build() -> None:
+    global _built, _version, _progress
+    CASES_DIR.mkdir(parents=True, exist_ok=True)
+    folders = sorted(
+        Path(entry.path) for entry in os.scandir(CASES_DIR)
+        if entry.is_dir() and not entry.name.startswith(".")
+    )
+    _progress = (0, len(folders))
+    done = 0
+    found: Dict[str, Dict[str, Any]] = {}
+
+    def _read(folder: Path) -> Tuple[str, Optional[Dict[str, Any]]]:
+        try:
+            return folder.name, _load_case(folder)
+        except Exception:
+            logger.exception("Could not read case %s", folder)
+            return folder.name, None
+
+    # each case is a handful of small reads; threads overlap their latency
+    with ThreadPoolExecutor(max_workers=scan_workers(), thread_name_prefix="case-scan") as pool:
+        for future in as_completed([pool.submit(_read, folder) for folder in folders]):
+            name, case = future.result()
+            done += 1
+            _progress = (done, len(folders))
+            if case is not None:
+                found[name] = case
+    with _lock:
+        _cases.clear()
+        # merged in name order, whatever order the threads finished in
+        _cases.update(sorted(found.items()))
+        # cases marked dirty meanwhile stay dirty: they are re-read on the next snapshot
+        _built = True
+        _version += 1
+    _progress = None
+    logger.info("Case catalog built (%s cases)", len(found))
+
+
+def build() -> None:
+    """Full scan of the cases directory."""
+    with _build_lock:
+        _build()
+
+
+def ensure_built() -> None:
+    if _built:
+        return
+    with _build_lock:
+        if not _built:
+            _build()
+
+
+def mark_dirty(folder_name: str) -> None:
+    with _lock:
+        _dirty.add(folder_name)
+
+
+def forget(folder_name: str) -> None:
+    global _version
+    with _lock:
+        if _cases.pop(folder_name, None) is not None:
+            _version += 1
+        _dirty.discard(folder_name)
+
+
+def _refresh_dirty() -> None:
+    global _version
+    with _lock:
+        dirty = sorted(_dirty)
+        _dirty.clear()
+    for name in dirty:
+        case = _load_case(CASES_DIR / name)
+        with _lock:
+            if case is None:
+                changed = _cases.pop(name, None) is not None
+            else:
+                changed = _cases.get(name) != case
+                _cases[name] = case
+            if changed:
+                _version += 1
+
+
+def snapshot() -> Tuple[int, List[Dict[str, Any]]]:
+    """(catalog version, cases sorted by folder name); only dirty cases touch the disk."""
+    ensure_built()
+    if _dirty:
+        _refresh_dirty()
+    with _lock:
+        return _version, [_cases[name] for name in sorted(_cases)]
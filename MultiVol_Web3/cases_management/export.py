@@ -0,0 +1,408 @@
+# export.py
+# Case downloads as an archive built while it is sent: files are read block by block, the blocks
+# are compressed in parallel on a thread pool and assembled in order straight into the HTTP
+# response (Starlette iterates the generator in a worker thread), so the event loop never waits.
+# Two formats: zip (deflate, each block an independent raw-deflate segment like pigz) and, for
+# transfers between analysis boxes, tar.zst (multi-threaded zstd, needs `zstandard`).
+# Finished archives are kept in cases/.export_cache, keyed by a content version of the case
+# (paths, sizes and mtimes of its files): a re-download of an unchanged case is a plain file
+# response (with Range support) and the cache is trimmed LRU-first to EXPORT_CACHE_GB.
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import struct
+import tarfile
+import threading
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Deque, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+from uuid import uuid4
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+from ..rxconfig import config
+from . import tiering, trash
+from .manifest import is_module_output
+from .outputs import open_output, output_size
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+CACHE_DIR = CASES_DIR / ".export_cache"
+
+READ_CHUNK = 1024 * 1024
+# unit of parallel compression
+BLOCK_SIZE = 4 * 1024 * 1024
+# a file is deflated only if its first SAMPLE bytes shrink below this ratio
+SAMPLE = 64 * 1024
+DEFLATE_RATIO = 0.9
+DEFLATE_LEVEL = 6
+ZSTD_LEVEL = 3
+# formats that are compressed already
+_STORED_SUFFIXES = {".gz", ".zip", ".zst", ".xz", ".lz4", ".bz2", ".7z", ".png", ".jpg", ".jpeg"}
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def export_threads() -> int:
+    try:
+        n = int(getattr(config, "export_threads", 0))
+    except (TypeError, ValueError):
+        n = 0
+    return n if n > 0 else (os.cpu_count() or 2)
+
+
+def _compress_pool() -> ThreadPoolExecutor:
+    # zlib releases the GIL while compressing, so threads use all cores
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=export_threads(), thread_name_prefix="export-compress")
+        return _pool
+
+
+def case_dir(slug: str) -> Path:
+    """Folder of the case `slug`; ValueError for anything that isn't a case."""
+    path = CASES_DIR / slug
+    if "/" in slug or "\\" in slug or slug.startswith(".") or not (path / "case_details.json").is_file():
+        raise ValueError(f"unknown case: {slug!r}")
+    return path
+
+
+def _open(path: Path) -> Tuple[BinaryIO, int]:
+    """(stream, size) of a case file as it goes into an archive: module outputs stored
+    compressed (outputs.py) are exported as plain JSON."""
+    if is_module_output(path):
+        size = output_size(path)
+        return open_output(path), size
+    f = path.open("rb")
+    return f, os.fstat(f.fileno()).st_size
+
+
+def compress_type(path: Path) -> int:
+    """STORED for data that doesn't compress (checked on a sample), DEFLATED otherwise."""
+    if path.suffix.lower() in _STORED_SUFFIXES:
+        return zipfile.ZIP_STORED
+    try:
+        f, _ = _open(path)
+        with f:
+            sample = f.read(SAMPLE)
+    except OSError:
+        return zipfile.ZIP_DEFLATED
+    if len(sample) < 512:
+        return zipfile.ZIP_STORED
+    ratio = len(zlib.compress(sample, 1)) / len(sample)
+    return zipfile.ZIP_DEFLATED if ratio < DEFLATE_RATIO else zipfile.ZIP_STORED
+
+
+def case_files(folder: Path) -> List[Path]:
+    return sorted(
+        p for p in folder.rglob("*")
+        if p.is_file() and not p.name.endswith(".tmp") and not p.name.startswith(".")
+    )
+
+
+def content_version(folder: Path) -> str:
+    """Changes whenever a file of the case is added, removed, resized or rewritten."""
+    digest = hashlib.sha256()
+    for path in case_files(folder):
+        try:
+            st = path.stat()
+        except FileNotFoundError:
+            continue
+        digest.update(f"{path.relative_to(folder).as_posix()}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()[:32]
+
+
+# ---------------- archive cache ----------------
+
+_evict_lock = threading.Lock()
+
+
+def cache_budget_bytes() -> int:
+    try:
+        return int(float(getattr(config, "export_cache_gb", 20)) * 1024 ** 3)
+    except (TypeError, ValueError):
+        return 20 * 1024 ** 3
+
+
+def _cached_path(slug: str, version: str, ext: str) -> Path:
+    return CACHE_DIR / slug / f"{version}.{ext}"
+
+
+def drop_cached(slug: str) -> None:
+    """Forget every archive of a case (deleted case)."""
+    trash.move_to_trash(CACHE_DIR / slug)
+
+
+def _evict(keep: Path) -> None:
+    """Remove older versions of `keep` (same case and format), then the least recently used
+    archives while the cache is over budget."""
+    fmt = keep.name.split(".", 1)[1]
+    with _evict_lock:
+        for other in keep.parent.iterdir():
+            if other != keep and not other.name.startswith(".") and other.name.split(".", 1)[1] == fmt:
+                other.unlink(missing_ok=True)
+        archives = []
+        for path in CACHE_DIR.glob("*/*"):
+            if path.name.startswith("."):
+                continue
+            try:
+                st = path.stat()
+            except FileNotFoundError:
+                continue
+            archives.append((st.st_mtime, st.st_size, path))
+        total = sum(size for _, size, _ in archives)
+        budget = cache_budget_bytes()
+        for _, size, path in sorted(archives, key=lambda a: a[0]):
+            if total <= budget:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            logger.info("Evicted cached archive %s", path)
+
+
+def _tee_to_cache(chunks: Iterator[bytes], folder: Path, final: Path, version: str) -> Iterator[bytes]:
+    """Pass `chunks` through while writing them to the cache; kept only if complete and current."""
+    final.parent.mkdir(parents=True, exist_ok=True)
+    tmp = final.with_name(f".{uuid4().hex}.tmp")
+    complete = False
+    try:
+        with tmp.open("wb") as f:
+            for data in chunks:
+                f.write(data)
+                yield data
+        # the case may have changed while it was being read
+        complete = content_version(folder) == version
+    finally:
+        # also reached when the client goes away mid-download (GeneratorExit)
+        if complete:
+            os.replace(tmp, final)
+            _evict(final)
+        else:
+            tmp.unlink(missing_ok=True)
+
+
+# ---------------- archive builders ----------------
+
+def _blocks(path: Path) -> Iterator[Tuple[bytes, bool]]:
+    """(block, is_last) of a file read BLOCK_SIZE at a time."""
+    f, _ = _open(path)
+    with f:
+        block = f.read(BLOCK_SIZE)
+        while True:
+            following = f.read(BLOCK_SIZE) if len(block) == BLOCK_SIZE else b""
+            yield block, not following
+            if not following:
+                return
+            block = following
+
+
+def _deflate_block(data: bytes, last: bool) -> bytes:
+    # independent raw-deflate segments: sync-flushed ones concatenate into one valid stream
+    c = zlib.compressobj(DEFLATE_LEVEL, zlib.DEFLATED, -zlib.MAX_WBITS)
+    return c.compress(data) + c.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+# items handed from the reader to the assembler, in archive order
+_Item = Tuple[str, Union[zipfile.ZipInfo, bytes, "Future[bytes]"]]
+
+
+def _zip_items(folder: Path, pool: ThreadPoolExecutor) -> Iterator[_Item]:
+    for path in case_files(folder):
+        arcname = f"{folder.name}/{path.relative_to(folder).as_posix()}"
+        try:
+            info = zipfile.ZipInfo.from_file(path, arcname, strict_timestamps=False)
+        except FileNotFoundError:
+            # removed while the archive was being built
+            continue
+        info.compress_type = compress_type(path)
+        info.flag_bits |= 0x08 | 0x800  # sizes in a data descriptor, utf-8 name
+        info.extract_version = info.create_version = zipfile.ZIP64_VERSION
+        crc, size = 0, 0
+        yield "start", info
+        try:
+            for block, last in _blocks(path):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+                if info.compress_type == zipfile.ZIP_DEFLATED:
+                    yield "data", pool.submit(_deflate_block, block, last)
+                else:
+                    yield "data", block
+        except FileNotFoundError:
+            pass
+        info.CRC, info.file_size = crc, size
+        yield "end", info
+
+
+def _central_record(info: zipfile.ZipInfo) -> bytes:
+    name = info.filename.encode("utf-8")
+    extra = struct.pack("<HHQQQ", 1, 24, info.file_size, info.compress_size, info.header_offset)
+    dostime = info.date_time[3] << 11 | info.date_time[4] << 5 | info.date_time[5] // 2
+    dosdate = (info.date_time[0] - 1980) << 9 | info.date_time[1] << 5 | info.date_time[2]
+    return struct.pack(
+        zipfile.structCentralDir, zipfile.stringCentralDir,
+        info.create_version, 3, info.extract_version, 0,
+        info.flag_bits, info.compress_type, dostime, dosdate, info.CRC,
+        0xFFFFFFFF, 0xFFFFFFFF, len(name), len(extra), 0, 0, 0,
+        info.external_attr, 0xFFFFFFFF,
+    ) + name + extra
+
+
+def _end_records(count: int, cd_offset: int, cd_size: int) -> bytes:
+    eocd64_offset = cd_offset + cd_size
+    return (
+        struct.pack(zipfile.structEndArchive64, zipfile.stringEndArchive64, 44, 45, 45, 0, 0,
+                    count, count, cd_size, cd_offset)
+        + struct.pack(zipfile.structEndArchive64Locator, zipfile.stringEndArchive64Locator, 0, eocd64_offset, 1)
+        + struct.pack(zipfile.structEndArchive, zipfile.stringEndArchive, 0, 0,
+                      min(count, 0xFFFF), min(count, 0xFFFF), min(cd_size, 0xFFFFFFFF),
+                      min(cd_offset, 0xFFFFFFFF), 0)
+    )
+
+
+def _in_order(items: Iterator[_Item], window: int) -> Iterator[_Item]:
+    """Resolve the compression futures of `items` in order, keeping up to `window` in flight."""
+    queue: Deque[_Item] = deque()
+    in_flight = 0
+    for item in items:
+        queue.append(item)
+        if isinstance(item[1], Future):
+            in_flight += 1
+        while in_flight >= window or (queue and not isinstance(queue[0][1], Future)):
+            kind, value = queue.popleft()
+            if isinstance(value, Future):
+                in_flight -= 1
+                value = value.result()
+            yield kind, value
+    while queue:
+        kind, value = queue.popleft()
+        yield kind, value.result() if isinstance(value, Future) else value
+
+
+def iter_case_zip(folder: Path) -> Iterator[bytes]:
+    """Zip64 of `folder` (entries under `<folder name>/`), yielded as it is produced."""
+    threads = export_threads()
+    offset = 0
+    written: List[zipfile.ZipInfo] = []
+    compressed = 0
+    for kind, value in _in_order(_zip_items(folder, _compress_pool()), window=threads * 2):
+        if kind == "start":
+            value.header_offset = offset
+            data = value.FileHeader(zip64=True)
+            compressed = 0
+        elif kind == "data":
+            data = value
+            compressed += len(data)
+        else:
+            value.compress_size = compressed
+            written.append(value)
+            data = struct.pack("<4sLQQ", b"PK\x07\x08", value.CRC, compressed, value.file_size)
+        offset += len(data)
+        if data:
+            yield data
+    central = b"".join(_central_record(info) for info in written)
+    yield central + _end_records(len(written), offset, len(central))
+
+
+def _tar_chunks(folder: Path) -> Iterator[bytes]:
+    """Uncompressed tar (pax) stream of `folder`."""
+    for path in case_files(folder):
+        try:
+            st = path.stat()
+            f, size = _open(path)
+        except FileNotFoundError:
+            continue
+        with f:
+            info = tarfile.TarInfo(f"{folder.name}/{path.relative_to(folder).as_posix()}")
+            info.size, info.mtime, info.mode = size, st.st_mtime, st.st_mode & 0o7777
+            yield info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+            remaining = info.size
+            while remaining:
+                data = f.read(min(READ_CHUNK, remaining))
+                if not data:
+                    # shrank while being read: keep the header's size
+                    data = b"\0" * remaining
+                yield data
+                remaining -= len(data)
+        yield b"\0" * (-info.size % tarfile.BLOCKSIZE)
+    yield b"\0" * (2 * tarfile.BLOCKSIZE)
+
+
+def zstd_available() -> bool:
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def iter_case_tar_zst(folder: Path) -> Iterator[bytes]:
+    """tar.zst of `folder`; zstd spreads the compression over export_threads() threads."""
+    import zstandard
+
+    compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, threads=export_threads()).compressobj()
+    for data in _tar_chunks(folder):
+        out = compressor.compress(data)
+        if out:
+            yield out
+    yield compressor.flush()
+
+
+FORMATS = {
+    "zip": (iter_case_zip, "application/zip"),
+    "tar.zst": (iter_case_tar_zst, "application/zstd"),
+}
+
+
+def _lookup_cached(folder: Path, slug: str, fmt: str) -> Tuple[str, Path, bool]:
+    """(content version, cache path, cached already) of a case export; stats every file."""
+    tiering.touch(folder)
+    version = content_version(folder)
+    cached = _cached_path(slug, version, fmt)
+    if not cached.exists():
+        return version, cached, False
+    # most recently used, for the LRU eviction
+    os.utime(cached)
+    return version, cached, True
+
+
+async def _download(request: Request):
+    slug, fmt = request.path_params["slug"], request.path_params["fmt"]
+    try:
+        folder = case_dir(slug)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=404)
+    if fmt not in FORMATS:
+        return JSONResponse({"error": f"unknown format: {fmt}"}, status_code=404)
+    if fmt == "tar.zst" and not zstd_available():
+        return JSONResponse({"error": "zstandard is not installed"}, status_code=501)
+    build, media_type = FORMATS[fmt]
+    # a cold case goes out complete (and is hot again afterwards)
+    await asyncio.to_thread(tiering.thaw, folder)
+    version, cached, hit = await asyncio.to_thread(_lookup_cached, folder, slug, fmt)
+    headers = {"ETag": f'"{version}"'}
+    if hit:
+        return FileResponse(cached, media_type=media_type, filename=f"{slug}.{fmt}", headers=headers)
+    logger.info("Streaming %s of case %s", fmt, slug)
+    headers["Content-Disposition"] = f"attachment; filename*=UTF-8''{quote(slug)}.{fmt}"
+    return StreamingResponse(
+        _tee_to_cache(build(folder), folder, cached, version),
+        media_type=media_type,
+        headers=headers,
+    )
+
+
+routes: List[Route] = [
+    Route("/api/cases/{slug}/{fmt}", _download, methods=["GET"]),
+]
@@ -4,13 +4,21 @@ from __future__ import annotations
 
 import logging
 from ..rxconfig import config
-from typing import List
+from typing import Callable, Dict, List, Optional
 import asyncio
 from pathlib import Path
-import json, shlex, os, socket, docker, pty, fcntl, select, errno
+import json, shlex, os, shutil, socket, docker, pty, errno, time
+from . import plugins as plugin_plans
+from . import outputs, result_cache, tiering
+from ..uploads import dropdir, store
+from .manifest import ingest_output
+from .plugins import dump_tag, output_filename, plan_plugins
 
 logger = logging.getLogger(__name__)
 
+# CLI output folders of the runs of cases with several dumps (a dot folder: not a case)
+RUNS_DIR = Path(__file__).parent.parent / "cases" / ".runs"
+
 
 def get_self_container():
     client = docker.DockerClient(base_url="unix://var/run/docker.sock")
@@ -35,176 +43,399 @@ def get_host_mount_for(path_in_container):
     return None
 
 
-async def after_upload(
-    state,
+async def _run_in_pty(command: str, on_line: Callable[[str], None]) -> int:
+    """Run `command` under a PTY and feed every output line to `on_line`.
+
+    The master side is read through the event loop (add_reader) instead of a
+    blocking select() so several analyses can stream at the same time.
+    """
+    master_fd, slave_fd = pty.openpty()
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "/bin/bash", "-lc", command,
+            stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
+        )
+    finally:
+        os.close(slave_fd)
+
+    os.set_blocking(master_fd, False)
+    loop = asyncio.get_running_loop()
+    eof = asyncio.Event()
+    buf = b""
+
+    def _on_readable():
+        nonlocal buf
+        try:
+            data = os.read(master_fd, 65536)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            # EIO: every slave fd is closed, the child is gone
+            data = b""
+        if not data:
+            loop.remove_reader(master_fd)
+            eof.set()
+            return
+        buf += data
+        while True:
+            idx = buf.find(b"\n")
+            if idx == -1:
+                break
+            line = buf[:idx]
+            buf = buf[idx + 1 :]
+            text = line.decode(errors="ignore").rstrip("\r")
+            if text:
+                on_line(text)
+
+    loop.add_reader(master_fd, _on_readable)
+    try:
+        rc = await proc.wait()
+        # drain whatever is still buffered in the PTY
+        try:
+            await asyncio.wait_for(eof.wait(), timeout=1.0)
+        except asyncio.TimeoutError:
+            pass
+    finally:
+        loop.remove_reader(master_fd)
+        os.close(master_fd)
+
+    if buf:
+        tail = buf.decode(errors="ignore").strip()
+        if tail:
+            on_line(tail)
+    return rc
+
+
+async def run_case_analysis(
+    log: Callable[[str], None],
     uploaded_files_names: List[str],
     case_name: str,
     os_value: str,
     mode_value: str
-):
+) -> bool:
+    """Create the case directory and run the MultiVol CLI on every dump.
+
+    Every (dump, plugin) pair of the plan is a separate CLI run. Runs are
+    dispatched longest-expected-runtime-first onto a pool bounded by
+    max_parallel_runs(), and each outcome is recorded in the case's
+    plugin_runs.json. Messages go through `log` (the activity log), prefixed
+    with the dump and plugin. Returns True when every run succeeded.
+    Fast triage plugins go before all of them, fastest first.
+    """
+    def _log(msg: str):
+        log(msg)
+        logger.info(msg)
+
+    current_path_parent = Path(__file__).parent.parent
+    cases_dir = current_path_parent / "cases"
+    new_case_dir = cases_dir / case_name.replace(" ", "_")
     try:
-        current_path_parent = Path(__file__).parent.parent
-        cases_dir = current_path_parent / "cases"
-        new_case_dir = cases_dir / case_name.replace(" ", "_")
         new_case_dir.mkdir(parents=True, exist_ok=True)
-        state.log_append(f"New case directory created: {new_case_dir}")
-        logger.info("New case directory created: %s", new_case_dir)
-        yield
+        _log(f"New case directory created: {new_case_dir}")
+        # a re-run of a cold case: its outputs come back before they are rewritten
+        await asyncio.to_thread(tiering.thaw, new_case_dir)
     except Exception as e:
         err = f"[ERROR] Failed to create case directory {new_case_dir}: {e}"
-        state.log_append(err)
+        log(err)
         logger.exception(err)
-        yield
-        return
+        return False
 
     try:
         case_details_path = new_case_dir / "case_details.json"
+        created = time.time()
+        if case_details_path.exists():
+            # a retried job keeps the case's original creation date
+            try:
+                with case_details_path.open("r", encoding="utf-8") as f:
+                    created = float(json.load(f).get("created", created))
+            except (OSError, ValueError, TypeError):
+                pass
         case_details = {
             "case_name": case_name,
             "case_details": "This is a test case for MultiVol",
             "case_os": os_value,
+            "created": created,
         }
         with case_details_path.open("w", encoding="utf-8") as f:
             json.dump(case_details, f, indent=4, ensure_ascii=False)
-        msg = f"Wrote case details to {case_details_path}"
-        state.log_append(msg)
-        logger.info(msg)
-        yield
+        _log(f"Wrote case details to {case_details_path}")
     except Exception as e:
         err = f"[ERROR] Failed to write case_details.json: {e}"
-        state.log_append(err)
+        log(err)
         logger.exception(err)
-        yield
 
-    for upload_name in uploaded_files_names:
+    plugins = plan_plugins(os_value, mode_value)
+    if not plugins:
+        _log(f"[ERROR] No plugin plan for os '{os_value}' / mode '{mode_value}'")
+        return False
+    _log(f"Planned {len(plugins)} plugin(s) x {len(uploaded_files_names)} dump(s)")
+
+    multi = len(uploaded_files_names) > 1
+    if multi:
+        tags: Dict[str, str] = {}
+        for name in uploaded_files_names:
+            other = tags.setdefault(dump_tag(name), name)
+            if other != name:
+                # both would write <plugin>@<tag>_output.json
+                _log(f"[ERROR] Dumps '{other}' and '{name}' can't be told apart in output names, rename one of them")
+                return False
+
+    try:
+        targets = {name: _resolve_paths(name) for name in uploaded_files_names}
+    except Exception as e:
+        err = f"[ERROR] Failed to resolve dump paths: {e}"
+        log(err)
+        logger.exception(err)
+        return False
+
+    # One queue across every dump of the case, ordered by plugins.dispatch_key (triage
+    # plugins fastest-first, then the rest longest-first). The pool semaphore is FIFO so
+    # creating the tasks in this order is the dispatch order.
+    order = {p: i for i, p in enumerate(plugin_plans.schedule(os_value, plugins))}
+    runs = sorted(
+        ((name, plugin) for name in uploaded_files_names for plugin in plugins),
+        key=lambda r: (order[r[1]], r[0]),
+    )
+    sem = _run_slots()
+
+    async def _one(upload_name: str, plugin: str) -> bool:
+        async with sem:
+            dump_path, symbols_path = targets[upload_name]
+            tag = f"[{Path(str(upload_name)).name}:{plugin}] " if multi else f"[{plugin}] "
+            return await _run_plugin(
+                lambda m: log(f"{tag}{m}"),
+                new_case_dir, upload_name, dump_path, symbols_path, plugin, os_value, mode_value,
+                per_dump=multi,
+            )
+
+    tasks = [asyncio.create_task(_one(name, plugin)) for name, plugin in runs]
+    try:
+        results = await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        raise
+    finally:
+        shutil.rmtree(RUNS_DIR / new_case_dir.name, ignore_errors=True)
+    failed = results.count(False)
+    _log(f"{len(results) - failed}/{len(results)} plugin run(s) succeeded")
+    return failed == 0
+
+
+def _available_memory_bytes() -> int:
+    try:
+        with open("/proc/meminfo", "r", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return 0
+
+
+def max_parallel_runs() -> int:
+    """How many CLI runs may execute at once (MAX_PARALLEL_RUNS, or derived from CPU and RAM)."""
+    try:
+        configured = int(getattr(config, "max_parallel_runs", None) or 0)
+    except (TypeError, ValueError):
+        configured = 0
+    if configured > 0:
+        return configured
+    try:
+        ram_per_run = float(getattr(config, "run_ram_gb", None) or 4) * 1024 ** 3
+    except (TypeError, ValueError):
+        ram_per_run = 4 * 1024 ** 3
+    by_cpu = os.cpu_count() or 1
+    by_ram = int(_available_memory_bytes() // ram_per_run) if ram_per_run > 0 else by_cpu
+    return max(1, min(by_cpu, by_ram))
+
+
+_run_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _run_slots() -> asyncio.Semaphore:
+    # Shared by every job so concurrent jobs don't oversubscribe the host
+    global _run_semaphore
+    if _run_semaphore is None:
+        limit = max_parallel_runs()
+        logger.info("Running up to %s plugin(s) in parallel", limit)
+        _run_semaphore = asyncio.Semaphore(limit)
+    return _run_semaphore
+
+
+def _resolve_paths(upload_name: str) -> tuple[str, Path]:
+    """(dump path, symbols path) as seen by the CLI (host paths when running in docker)."""
+    if config.is_container == "True":
+        symbols_path = get_host_mount_for(str(Path(__file__).parent.parent / "profiles_json"))
+    else:
+        symbols_path = Path(__file__).parent.parent / "profiles_json"
+
+    source = store.source_path(upload_name)
+    if source is not None:
+        # imported from the drop directory: read in place
+        root = dropdir.drop_dir()
+        if config.is_container == "True" and root is not None and source.is_relative_to(root):
+            dump_path = f"{get_host_mount_for(str(root))}/{source.relative_to(root)}"
+        else:
+            dump_path = str(source)
+    elif config.is_container == "True":
+        uploads_mount = get_host_mount_for(str(Path(__file__).parent.parent.parent / "uploaded_files"))
+        dump_path = f"{uploads_mount}/{str(upload_name).replace('uploaded_files/','')}"
+    else:
+        dump_path = str(Path(__file__).parent.parent.parent / "uploaded_files" / Path(str(upload_name)).name)
+    return dump_path, symbols_path
+
+
+def _build_command(dump_path: str, symbols_path: Path, new_case_dir: Path, plugin: str, os_value: str, mode_value: str) -> str:
+    multivol_script = Path(f"{config.cli_multivol_path}") / "main.py"
+    if os_value == "linux":
+        return (
+            f"python3 {shlex.quote(str(multivol_script))} vol3 "
+            f"--dump {shlex.quote(str(dump_path))} "
+            f"--image volatility3 "
+            f"--{os_value} "
+            f"--commands {shlex.quote(plugin)} "
+            f"--output-path {shlex.quote(str(new_case_dir))} "
+            f"--symbols-path {shlex.quote(str(symbols_path))} "
+            f"--format json"
+        )
+    return (
+        f"python3 {shlex.quote(str(multivol_script))} vol3 "
+        f"--dump {shlex.quote(str(dump_path))} "
+        f"--image volatility3 "
+        f"--{os_value} "
+        f"--{mode_value} "
+        f"--commands {shlex.quote(plugin)} "
+        f"--output-path {shlex.quote(str(new_case_dir))} "
+        f"--format json"
+    )
+
+
+def _record_plugin_run(case_dir: Path, upload_name: str, plugin: str, record: Dict[str, object]) -> None:
+    """Keep the per-plugin outcome of the case in <case>/plugin_runs.json."""
+    path = case_dir / "plugin_runs.json"
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            runs = json.load(f)
+    except (OSError, ValueError):
+        runs = {}
+    runs.setdefault(Path(str(upload_name)).name, {})[plugin] = record
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(runs, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+async def _run_plugin(
+    log: Callable[[str], None],
+    new_case_dir: Path,
+    upload_name: str,
+    dump_path: str,
+    symbols_path: Path,
+    plugin: str,
+    os_value: str,
+    mode_value: str,
+    per_dump: bool = False,
+) -> bool:
+    """Run a single plugin of the MultiVol CLI on one dump and record the outcome.
+
+    When the same dump already went through this plugin (same options, Volatility and
+    symbols), the cached output is linked into the case instead.
+
+    With `per_dump` (cases of several dumps) the CLI writes into a run folder of its own,
+    since the same plugin runs at the same time on the other dumps, and the output is then
+    moved into the case under the dump's name (plugins.output_filename).
+    """
+    started = time.time()
+    rc: Optional[int] = None
+    error = ""
+    output = new_case_dir / "volatility3_output" / output_filename(plugin, upload_name if per_dump else "")
+    run_dir = RUNS_DIR / new_case_dir.name / dump_tag(upload_name) if per_dump else new_case_dir
+    written = run_dir / "volatility3_output" / output_filename(plugin)
+    cache_key: Optional[str] = None
+    try:
+        cache_key = await asyncio.to_thread(
+            result_cache.key_for_dump, upload_name, plugin, {"os": os_value, "mode": mode_value, "format": "json"}
+        )
+        if cache_key and await asyncio.to_thread(result_cache.restore, cache_key, output):
+            log("[cache] reused the output of a previous run on this dump")
+            _record_plugin_run(new_case_dir, upload_name, plugin, {
+                "status": "done",
+                "priority": plugin_plans.priority(os_value, plugin),
+                "returncode": 0,
+                "error": "",
+                "runtime": 0.0,
+                "cached": True,
+                "finished": time.time(),
+            })
+            await _ingest(output)
+            return True
+    except Exception:
+        logger.exception("Result cache lookup failed for %s on %s", plugin, upload_name)
+
+    try:
+        # never write through a hard link shared with the result cache
+        output.unlink(missing_ok=True)
+        written.unlink(missing_ok=True)
+        command = _build_command(dump_path, symbols_path, run_dir, plugin, os_value, mode_value)
+        log(f"[EXECUTING] {command}")
+        logger.info("Executing: %s", command)
+
+        rc = await _run_in_pty(command, lambda text: log(f"[post] {text}"))
+
+        if rc != 0:
+            error = f"command failed with return code {rc}"
+        elif not written.exists():
+            error = f"no output written ({written.name})"
+        elif written != output:
+            output.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(written, output)
+    except Exception as e:
+        error = f"exception: {e}"
+        logger.exception("Plugin %s failed on %s", plugin, upload_name)
+
+    runtime = round(time.time() - started, 2)
+    if error:
+        log(f"[ERROR] {error}")
+        logger.error("%s on %s: %s", plugin, upload_name, error)
+    else:
+        log(f"[post] command succeeded in {runtime}s")
+        logger.info("%s on %s succeeded in %ss", plugin, upload_name, runtime)
         try:
-            state.log_append(f"File {upload_name} uploaded successfully.")
-            logger.info("File %s uploaded successfully.", upload_name)
-            yield
-
-            multivol_script = Path(f"{config.cli_multivol_path}") / "main.py"
-
-            if config.is_container == "True":
-                symbols_path = get_host_mount_for(str(Path(__file__).parent.parent / "profiles_json"))
-            else:
-                symbols_path = Path(__file__).parent.parent / "profiles_json"
-
-            if config.is_container == "True":
-                uploads_mount = get_host_mount_for(str(Path(__file__).parent.parent.parent / "uploaded_files"))
-                dump_path = f"{uploads_mount}/{str(upload_name).replace('uploaded_files/','')}"
-            else:
-                dump_path = str(Path(__file__).parent.parent.parent / "uploaded_files" / Path(str(upload_name)).name)
-
-            state.log_append(f"Dump path is {dump_path}")
-
-            if os_value == "linux":
-                command = (
-                    f"python3 {shlex.quote(str(multivol_script))} vol3 "
-                    f"--dump {shlex.quote(str(dump_path))} "
-                    f"--image volatility3 "
-                    f"--{os_value} "
-                    f"--output-path {shlex.quote(str(new_case_dir))} "
-                    f"--symbols-path {shlex.quote(str(symbols_path))} "
-                    f"--format json"
-                )
-            else:
-                command = (
-                    f"python3 {shlex.quote(str(multivol_script))} vol3 "
-                    f"--dump {shlex.quote(str(dump_path))} "
-                    f"--image volatility3 "
-                    f"--{os_value} "
-                    f"--{mode_value} "
-                    f"--output-path {shlex.quote(str(new_case_dir))} "
-                    f"--format json"
-                )
-
-            state.log_append(f"[EXECUTING] {command}")
-            logger.info("Executing: %s", command)
-            yield
-
-            # ----- FULL PTY EXECUTION & STREAMING -----
-            master_fd, slave_fd = pty.openpty()
-            try:
-                proc = await asyncio.create_subprocess_exec(
-                    "/bin/bash", "-lc", command,
-                    stdin=slave_fd, stdout=slave_fd, stderr=slave_fd,
-                )
-            finally:
-                os.close(slave_fd)
-
-            # make master non-blocking
-            flags = fcntl.fcntl(master_fd, fcntl.F_GETFL)
-            fcntl.fcntl(master_fd, fcntl.F_SETFL, flags | os.O_nonblock if hasattr(os, "O_nonblock") else os.O_NONBLOCK)
-
-            wait_task = asyncio.create_task(proc.wait())
-            buf = b""
-
-            while True:
-                r, _, _ = select.select([master_fd], [], [], 0.2)
-                if master_fd in r:
-                    try:
-                        data = os.read(master_fd, 65536)
-                    except OSError as e:
-                        if e.errno not in (errno.EAGAIN, errno.EWOULDBLOCK):
-                            raise
-                        data = b""
-                    if data:
-                        buf += data
-                        while True:
-                            idx = buf.find(b"\n")
-                            if idx == -1:
-                                break
-                            line = buf[:idx]
-                            buf = buf[idx + 1 :]
-                            text = line.decode(errors="ignore").rstrip("\r")
-                            if text:
-                                state.log_append(f"[post] {text}")
-                                yield
-                if wait_task.done():
-                    # drain any remaining data quickly
-                    while True:
-                        r2, _, _ = select.select([master_fd], [], [], 0.05)
-                        if master_fd not in r2:
-                            break
-                        try:
-                            data = os.read(master_fd, 65536)
-                        except OSError:
-                            break
-                        if not data:
-                            break
-                        buf += data
-                        while True:
-                            idx = buf.find(b"\n")
-                            if idx == -1:
-                                break
-                            line = buf[:idx]
-                            buf = buf[idx + 1 :]
-                            text = line.decode(errors="ignore").rstrip("\r")
-                            if text:
-                                state.log_append(f"[post] {text}")
-                                yield
-                    break
-
-            if buf:
-                tail = buf.decode(errors="ignore").strip()
-                if tail:
-                    state.log_append(f"[post] {tail}")
-                    yield
-
-            rc = wait_task.result()
-            os.close(master_fd)
-
-            if rc == 0:
-                state.log_append("[post] command succeeded")
-                logger.info("Command succeeded.")
-            else:
-                state.log_append(f"[ERROR] command failed with return code {rc}")
-                logger.error("Command failed with return code %s", rc)
-            yield
-            # ----- END PTY EXECUTION -----
-
-        except Exception as e:
-            err = f"[ERROR] Exception while processing {upload_name}: {e}"
-            state.log_append(err)
-            logger.exception(err)
-            yield
+            # before the cache links it, so both share the compressed file
+            await asyncio.to_thread(outputs.compress_output, output)
+        except Exception:
+            logger.exception("Could not compress the output of %s", plugin)
+        try:
+            plugin_plans.record_runtime(plugin, runtime)
+            if cache_key:
+                await asyncio.to_thread(result_cache.save, cache_key, output)
+        except Exception:
+            logger.exception("Could not record runtime / cache the output of %s", plugin)
+
+    try:
+        _record_plugin_run(new_case_dir, upload_name, plugin, {
+            "status": "failed" if error else "done",
+            "priority": plugin_plans.priority(os_value, plugin),
+            "returncode": rc,
+            "error": error,
+            "runtime": runtime,
+            "cached": False,
+            "finished": time.time(),
+        })
+    except Exception:
+        logger.exception("Could not record plugin run %s for %s", plugin, upload_name)
+    if not error:
+        await _ingest(output)
+    return not error
+
+
+async def _ingest(output: Path) -> None:
+    # manifest entry right away (with its runtime), /cases never has to parse the output
+    try:
+        await asyncio.to_thread(ingest_output, output)
+    except Exception:
+        logger.exception("Could not add %s to the case manifest", output)
@@ -0,0 +1,220 @@
+# jobs.py
+# Durable analysis queue. Uploads only enqueue a job here; a small pool of workers started with the
+# app picks jobs up, so an analysis survives browser disconnects and backend restarts.
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..rxconfig import config
+from .handle_case import run_case_analysis
+
+logger = logging.getLogger(__name__)
+
+# Same logger as the activity log of the upload page (created in MultiVol_Web3.py)
+ACTIVITY_LOG = logging.getLogger("app-log")
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+DB_PATH = CASES_DIR / "jobs.sqlite3"
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    case_name TEXT NOT NULL,
+    os TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    dumps TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT NOT NULL DEFAULT '',
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs(status, id);
+"""
+
+_wakeup: Optional[asyncio.Event] = None
+
+
+def _int_setting(value: Any, default: int) -> int:
+    try:
+        return max(1, int(value))
+    except (TypeError, ValueError):
+        return default
+
+
+def max_concurrent_jobs() -> int:
+    return _int_setting(getattr(config, "max_concurrent_jobs", None), 2)
+
+
+def max_attempts() -> int:
+    return _int_setting(getattr(config, "job_max_attempts", None), 3)
+
+
+def _connect() -> sqlite3.Connection:
+    CASES_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(DB_PATH, timeout=30, isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.executescript(_SCHEMA)
+    return conn
+
+
+@contextmanager
+def _db():
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    job = dict(row)
+    job["dumps"] = json.loads(job["dumps"])
+    return job
+
+
+def enqueue(case_name: str, os_value: str, mode_value: str, dumps: List[str]) -> int:
+    """Persist a new analysis job and wake the workers. Returns the job id."""
+    with _db() as conn:
+        cur = conn.execute(
+            "INSERT INTO jobs (case_name, os, mode, dumps, status, created) VALUES (?, ?, ?, ?, ?, ?)",
+            (case_name, os_value, mode_value, json.dumps(dumps), QUEUED, time.time()),
+        )
+        job_id = int(cur.lastrowid)
+    if _wakeup is not None:
+        _wakeup.set()
+    return job_id
+
+
+def list_jobs(limit: int = 20) -> List[Dict[str, Any]]:
+    """Most recent jobs first."""
+    with _db() as conn:
+        rows = conn.execute("SELECT * FROM jobs ORDER BY id DESC LIMIT ?", (limit,)).fetchall()
+    return [_row_to_dict(r) for r in rows]
+
+
+def active_cases() -> List[str]:
+    """Names of the cases with a queued or running job."""
+    with _db() as conn:
+        rows = conn.execute(
+            "SELECT DISTINCT case_name FROM jobs WHERE status IN (?, ?)", (QUEUED, RUNNING)
+        ).fetchall()
+    return [r[0] for r in rows]
+
+
+def _claim_next() -> Optional[Dict[str, Any]]:
+    """Atomically move the oldest queued job to running."""
+    with _db() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT * FROM jobs WHERE status = ? ORDER BY id LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if row is None:
+            conn.execute("COMMIT")
+            return None
+        conn.execute(
+            "UPDATE jobs SET status = ?, attempts = attempts + 1, started = ?, error = '' WHERE id = ?",
+            (RUNNING, time.time(), row["id"]),
+        )
+        conn.execute("COMMIT")
+    job = _row_to_dict(row)
+    job["attempts"] += 1
+    return job
+
+
+def _finish(job_id: int, status: str, error: str = "") -> None:
+    with _db() as conn:
+        conn.execute(
+            "UPDATE jobs SET status = ?, error = ?, finished = ? WHERE id = ?",
+            (status, error, time.time(), job_id),
+        )
+
+
+def _requeue_or_fail(job: Dict[str, Any], error: str) -> None:
+    if job["attempts"] < max_attempts():
+        with _db() as conn:
+            conn.execute("UPDATE jobs SET status = ?, error = ? WHERE id = ?", (QUEUED, error, job["id"]))
+    else:
+        _finish(job["id"], FAILED, error)
+
+
+def recover_interrupted() -> int:
+    """Jobs left `running` by a previous process are retried (or failed once out of attempts)."""
+    with _db() as conn:
+        rows = conn.execute("SELECT * FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+    for row in rows:
+        _requeue_or_fail(_row_to_dict(row), "interrupted by a backend restart")
+    return len(rows)
+
+
+async def _run_job(job: Dict[str, Any]) -> None:
+    ACTIVITY_LOG.info(
+        f"[JOB {job['id']}] starting case '{job['case_name']}' (attempt {job['attempts']}/{max_attempts()})"
+    )
+    try:
+        ok = await run_case_analysis(
+            ACTIVITY_LOG.info,
+            job["dumps"],
+            job["case_name"],
+            job["os"],
+            job["mode"],
+        )
+    except asyncio.CancelledError:
+        # Backend is shutting down: leave it `running`, recover_interrupted() picks it up next start
+        raise
+    except Exception as e:
+        logger.exception("Job %s crashed", job["id"])
+        _requeue_or_fail(job, str(e))
+        ACTIVITY_LOG.info(f"[JOB {job['id']}] error: {e}")
+        return
+
+    if ok:
+        _finish(job["id"], DONE)
+        ACTIVITY_LOG.info(f"[JOB {job['id']}] done")
+    else:
+        _finish(job["id"], FAILED, "one or more dumps failed, see the activity log")
+        ACTIVITY_LOG.info(f"[JOB {job['id']}] failed")
+
+
+async def _worker(n: int) -> None:
+    assert _wakeup is not None
+    while True:
+        job = await asyncio.to_thread(_claim_next)
+        if job is None:
+            _wakeup.clear()
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=5)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        logger.info("Worker %s picked job %s", n, job["id"])
+        await _run_job(job)
+
+
+async def run_worker_pool() -> None:
+    """Lifespan task: resume interrupted jobs, then run `max_concurrent_jobs` workers forever."""
+    global _wakeup
+    _wakeup = asyncio.Event()
+    recovered = await asyncio.to_thread(recover_interrupted)
+    if recovered:
+        ACTIVITY_LOG.info(f"[JOBS] {recovered} interrupted job(s) re-queued after restart")
+    workers = [asyncio.create_task(_worker(i)) for i in range(max_concurrent_jobs())]
+    try:
+        await asyncio.gather(*workers)
+    finally:
+        for w in workers:
+            w.cancel()
@@ -0,0 +1,308 @@
+# manifest.py
+# Per-case manifest.json: one entry per module output (status, rows, size, columns...), so pages
+# don't need to re-parse the outputs to know what a case contains.
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .outputs import open_output, output_size
+from .plugins import dump_tag
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+OUTPUT_DIR = "volatility3_output"
+OUTPUT_SUFFIX = "_output.json"
+
+# outputs up to this size are parsed in full (CLI error payloads are tiny); bigger ones are
+# probed from their first/last PROBE_READ bytes
+PROBE_FULL_MAX = 256 * 1024
+PROBE_READ = 64 * 1024
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _case_lock(case_dir: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(str(case_dir), threading.Lock())
+
+
+def _json_failure_flag(data: Any) -> bool:
+    if data == 0:
+        return True
+    """Best-effort failure flag (handles dicts & lists)."""
+    if isinstance(data, dict):
+        if isinstance(data.get("failure"), bool):
+            return bool(data["failure"])
+        if data.get("status") in {"failed", "error"}:
+            return True
+        if any(k in data for k in ("error", "traceback", "exception")):
+            return True
+        return False
+    if isinstance(data, list):
+        for item in data:
+            if isinstance(item, dict):
+                if item.get("failure") is True:
+                    return True
+                if item.get("status") in {"failed", "error"}:
+                    return True
+                if any(k in item for k in ("error", "traceback", "exception")):
+                    return True
+        return False
+    return False
+
+
+def _label_from_filename(f: str) -> str:
+    name = Path(f).name
+    suffix = OUTPUT_SUFFIX
+    if name.endswith(suffix):
+        # one output per dump (<plugin>@<dump>): still the plugin's label
+        base = name[: -len(suffix)].split("@", 1)[0]
+        # take the segment after the last '.' if present
+        if "." in base:
+            return base.split(".")[-1]
+    return Path(f).stem
+
+
+def is_module_output(path: Path) -> bool:
+    return path.name.endswith(OUTPUT_SUFFIX) and path.parent.name == OUTPUT_DIR
+
+
+def _rows_of(data: Any) -> List[Any]:
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        return data["data"]
+    return data if isinstance(data, list) else []
+
+
+def _plugin_runtime(case_dir: Path, output_name: str) -> Optional[float]:
+    """Runtime recorded by the job runner in plugin_runs.json, if this output came from it."""
+    plugin = output_name[: -len(OUTPUT_SUFFIX)]
+    # <plugin>@<dump tag>: one output per dump, only that dump's run counts
+    plugin, _, tag = plugin.partition("@")
+    try:
+        with (case_dir / "plugin_runs.json").open("r", encoding="utf-8") as f:
+            runs = json.load(f)
+    except (OSError, ValueError):
+        return None
+    for dump, per_dump in runs.items():
+        if tag and dump_tag(dump) != tag:
+            continue
+        rec = per_dump.get(plugin)
+        if isinstance(rec, dict) and rec.get("runtime") is not None:
+            return float(rec["runtime"])
+    return None
+
+
+def read_head_tail(path: Path, size: int) -> Tuple[str, str]:
+    """First and last PROBE_READ bytes of an output (`size` uncompressed), decoded leniently."""
+    with open_output(path) as f:
+        head = f.read(PROBE_READ)
+        f.seek(max(size - PROBE_READ, len(head)))
+        tail = f.read(PROBE_READ)
+    return head.decode("utf-8", "replace"), (head + tail)[-PROBE_READ:].decode("utf-8", "replace")
+
+
+_decoder = json.JSONDecoder()
+
+
+def _skip_ws(text: str, i: int) -> int:
+    while i < len(text) and text[i] in " \t\r\n":
+        i += 1
+    return i
+
+
+def _probe(path: Path, size: int) -> Optional[Tuple[bool, Optional[Dict[str, Any]]]]:
+    """(failure, first row) of a big output from a bounded head/tail read; None when undecided.
+
+    A big file is a success unless its first row, or a key read before the rows, carries
+    the error markers the CLI writes.
+    """
+    head, tail = read_head_tail(path, size)
+    i = _skip_ws(head, 0)
+    if head[i:i + 1] == "[":
+        if not tail.rstrip().endswith("]"):
+            # cut short: would not parse
+            return True, None
+        try:
+            first, _ = _decoder.raw_decode(head, _skip_ws(head, i + 1))
+        except ValueError:
+            # the first row doesn't fit in the head: rows, not an error payload
+            return False, None
+        row = first if isinstance(first, dict) else None
+        return _json_failure_flag([first]), row
+    if head[i:i + 1] == "{":
+        if not tail.rstrip().endswith("}"):
+            return True, None
+        # decode top-level members until one runs past the head
+        seen: Dict[str, Any] = {}
+        j = _skip_ws(head, i + 1)
+        try:
+            while j < len(head) and head[j] != "}":
+                key, j = _decoder.raw_decode(head, j)
+                j = _skip_ws(head, j)
+                if head[j:j + 1] != ":":
+                    return None
+                value, j = _decoder.raw_decode(head, _skip_ws(head, j + 1))
+                seen[key] = value
+                j = _skip_ws(head, j)
+                if head[j:j + 1] == ",":
+                    j = _skip_ws(head, j + 1)
+        except ValueError:
+            pass
+        rows = _rows_of(seen)
+        row = next((r for r in rows if isinstance(r, dict)), None)
+        return _json_failure_flag(seen), row
+    # not JSON at all
+    return True, None
+
+
+def summarize_output(path: Path, full: bool = True) -> Dict[str, Any]:
+    """Describe one module output for the manifest.
+
+    With `full=False` big outputs are only probed (status, columns); their row count is
+    left unknown (None) until a full ingest.
+    """
+    st = path.stat()
+    size = output_size(path)
+    probed = _probe(path, size) if not full and size > PROBE_FULL_MAX else None
+    if probed is not None:
+        failure, first = probed
+        rows_count: Optional[int] = None
+    else:
+        try:
+            with open_output(path, text=True) as f:
+                data = json.load(f)
+            failure = _json_failure_flag(data)
+        except Exception:
+            data = None
+            failure = _json_failure_flag(0)
+        rows = _rows_of(data)
+        first = next((r for r in rows if isinstance(r, dict)), None)
+        rows_count = len(rows)
+    return {
+        "file": path.name,
+        "label": _label_from_filename(path.name),
+        "status": "failed" if failure else "ok",
+        "rows": rows_count,
+        "bytes": st.st_size,
+        "size": size,
+        "mtime": st.st_mtime,
+        "columns": list(first.keys()) if first else [],
+        "runtime": _plugin_runtime(path.parent.parent, path.name),
+        "ingested": time.time(),
+    }
+
+
+def probe_failure(path: Path) -> bool:
+    """Failure flag of an output without reading gigabytes; full parse only as a fallback."""
+    size = output_size(path)
+    if size == 0:
+        return True
+    if size > PROBE_FULL_MAX:
+        probed = _probe(path, size)
+        if probed is not None:
+            return probed[0]
+    try:
+        with open_output(path, text=True) as f:
+            return _json_failure_flag(json.load(f))
+    except Exception:
+        return _json_failure_flag(0)
+
+
+def read_manifest(case_dir: Path) -> Dict[str, Any]:
+    try:
+        with (case_dir / MANIFEST_NAME).open("r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if isinstance(manifest, dict) and manifest.get("version") == MANIFEST_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": MANIFEST_VERSION, "case": case_dir.name, "modules": {}, "updated": 0.0}
+
+
+def _write_manifest(case_dir: Path, manifest: Dict[str, Any]) -> None:
+    manifest["updated"] = time.time()
+    path = case_dir / MANIFEST_NAME
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=4, ensure_ascii=False)
+    os.replace(tmp, path)
+
+
+def refresh_manifest(case_dir: Path) -> Dict[str, Any]:
+    """Manifest of `case_dir`, re-summarizing only outputs whose mtime or size moved.
+
+    Outputs that disappeared are dropped; the file is only rewritten when something changed.
+    """
+    out_dir = case_dir / OUTPUT_DIR
+    on_disk: Dict[str, os.stat_result] = {}
+    if out_dir.is_dir():
+        for entry in os.scandir(out_dir):
+            if entry.name.endswith(OUTPUT_SUFFIX) and entry.is_file():
+                on_disk[entry.name] = entry.stat()
+    with _case_lock(case_dir):
+        manifest = read_manifest(case_dir)
+        modules = manifest["modules"]
+        changed = False
+        # entries of outputs packed away by tiering.py stay
+        for name in [n for n in modules if n not in on_disk and not modules[n].get("cold")]:
+            del modules[name]
+            changed = True
+        for name, st in on_disk.items():
+            known = modules.get(name)
+            if known and known.get("mtime") == st.st_mtime and known.get("bytes") == st.st_size:
+                continue
+            try:
+                modules[name] = summarize_output(out_dir / name, full=False)
+            except FileNotFoundError:
+                continue
+            changed = True
+        if changed:
+            _write_manifest(case_dir, manifest)
+    return manifest
+
+
+def update_entries(case_dir: Path, changes: Dict[str, Dict[str, Any]]) -> None:
+    """Set fields of existing manifest entries (a None value removes the field)."""
+    with _case_lock(case_dir):
+        manifest = read_manifest(case_dir)
+        for name, fields in changes.items():
+            entry = manifest["modules"].get(name)
+            if entry is None:
+                continue
+            for key, value in fields.items():
+                if value is None:
+                    entry.pop(key, None)
+                else:
+                    entry[key] = value
+        _write_manifest(case_dir, manifest)
+
+
+def ingest_output(path: Path) -> Dict[str, Any]:
+    """(Re)index one `*_output.json` into its case manifest and return the entry.
+
+    An entry that is already current (same mtime and size, runtime known) is kept as is.
+    """
+    case_dir = path.parent.parent
+    st = path.stat()
+    known = read_manifest(case_dir)["modules"].get(path.name)
+    if (
+        known and known.get("mtime") == st.st_mtime and known.get("bytes") == st.st_size
+        and known.get("runtime") is not None and known.get("rows") is not None
+    ):
+        return known
+    entry = summarize_output(path)
+    with _case_lock(case_dir):
+        manifest = read_manifest(case_dir)
+        manifest["modules"][entry["file"]] = entry
+        _write_manifest(case_dir, manifest)
+    logger.info("Ingested %s (%s rows, %s)", path, entry["rows"], entry["status"])
+    return entry
@@ -0,0 +1,236 @@
+# outputs.py
+# At-rest compression of module outputs. With COMPRESS_OUTPUTS set (a zstd level), a finished
+# `*_output.json` is rewritten in place as zstd, in the seekable format of zstd's contrib
+# (independent frames of FRAME_SIZE plus a seek table in a trailing skippable frame), keeping
+# its name: nothing that lists or links outputs needs to know. Readers go through open_output(),
+# which recognises the zstd magic and decompresses transparently; thanks to the seek table a
+# head/tail probe of a multi-GB output only decompresses the frames it touches.
+from __future__ import annotations
+
+import io
+import logging
+import os
+import struct
+import threading
+from bisect import bisect_right
+from pathlib import Path
+from typing import BinaryIO, Dict, IO, List, Optional, Tuple, Union
+from uuid import uuid4
+
+from ..rxconfig import config
+
+logger = logging.getLogger(__name__)
+
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+SKIPPABLE_MAGIC = 0x184D2A5E
+SEEKABLE_MAGIC = 0x8F92EAB1
+# uncompressed bytes per frame: the unit of random access
+FRAME_SIZE = 4 * 1024 * 1024
+# below this, the frame and seek table overhead isn't worth it
+MIN_SIZE = 64 * 1024
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def compression_level() -> int:
+    """zstd level outputs are stored with, 0 when compression is off (or zstandard missing)."""
+    try:
+        level = int(getattr(config, "compress_outputs", 0) or 0)
+    except (TypeError, ValueError):
+        return 0
+    if level <= 0:
+        return 0
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        return 0
+    return level
+
+
+def read_seek_table(f: BinaryIO) -> Optional[List[Tuple[int, int]]]:
+    """(compressed size, decompressed size) of every frame, None without a seek table."""
+    end = f.seek(0, os.SEEK_END)
+    if end < 17:
+        return None
+    f.seek(end - 9)
+    count, descriptor, magic = struct.unpack("<IBI", f.read(9))
+    if magic != SEEKABLE_MAGIC:
+        return None
+    entry = 12 if descriptor & 0x80 else 8
+    table = count * entry
+    if end < table + 17:
+        return None
+    f.seek(end - 9 - table - 8)
+    skippable, length = struct.unpack("<II", f.read(8))
+    if skippable != SKIPPABLE_MAGIC or length != table + 9:
+        return None
+    raw = f.read(table)
+    return [struct.unpack_from("<II", raw, i * entry) for i in range(count)]
+
+
+class _SeekableZstd(io.RawIOBase):
+    """Random-access reads over a seekable zstd file; one decompressed frame is kept."""
+
+    def __init__(self, f: BinaryIO, frames: List[Tuple[int, int]]):
+        import zstandard
+
+        self._f = f
+        self._frames = frames
+        self._dctx = zstandard.ZstdDecompressor()
+        self._c_offsets = [0]
+        self._d_offsets = [0]
+        for c_size, d_size in frames:
+            self._c_offsets.append(self._c_offsets[-1] + c_size)
+            self._d_offsets.append(self._d_offsets[-1] + d_size)
+        self._pos = 0
+        self._cached: Tuple[int, bytes] = (-1, b"")
+
+    @property
+    def size(self) -> int:
+        return self._d_offsets[-1]
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._pos
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        base = {os.SEEK_SET: 0, os.SEEK_CUR: self._pos, os.SEEK_END: self.size}[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def _frame(self, index: int) -> bytes:
+        if self._cached[0] != index:
+            self._f.seek(self._c_offsets[index])
+            data = self._f.read(self._frames[index][0])
+            self._cached = (index, self._dctx.decompress(data, max_output_size=self._frames[index][1]))
+        return self._cached[1]
+
+    def readinto(self, b) -> int:
+        if self._pos >= self.size:
+            return 0
+        index = bisect_right(self._d_offsets, self._pos) - 1
+        frame = memoryview(self._frame(index))
+        start = self._pos - self._d_offsets[index]
+        n = min(len(b), len(frame) - start)
+        b[:n] = frame[start:start + n]
+        self._pos += n
+        return n
+
+    def readall(self) -> bytes:
+        # whole-file reads (json.load) go frame by frame, not DEFAULT_BUFFER_SIZE at a time
+        parts = []
+        while self._pos < self.size:
+            index = bisect_right(self._d_offsets, self._pos) - 1
+            parts.append(self._frame(index)[self._pos - self._d_offsets[index]:])
+            self._pos = self._d_offsets[index + 1]
+        return b"".join(parts)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._f.close()
+        super().close()
+
+
+def is_compressed(path: Path) -> bool:
+    with path.open("rb") as f:
+        return f.read(4) == ZSTD_MAGIC
+
+
+def open_output(path: Path, text: bool = False) -> Union[BinaryIO, IO[str]]:
+    """Open a module output for reading, compressed or not; seekable either way."""
+    f = path.open("rb")
+    try:
+        if f.read(4) == ZSTD_MAGIC:
+            frames = read_seek_table(f)
+            if frames is None:
+                raise ValueError(f"{path} is zstd without a seek table")
+            stream: BinaryIO = io.BufferedReader(_SeekableZstd(f, frames), buffer_size=64 * 1024)
+        else:
+            f.seek(0)
+            stream = f
+    except BaseException:
+        f.close()
+        raise
+    return io.TextIOWrapper(stream, encoding="utf-8") if text else stream
+
+
+def output_size(path: Path) -> int:
+    """Uncompressed size of a module output."""
+    with path.open("rb") as f:
+        if f.read(4) == ZSTD_MAGIC:
+            frames = read_seek_table(f)
+            if frames is not None:
+                return sum(d_size for _, d_size in frames)
+        return os.fstat(f.fileno()).st_size
+
+
+def _path_lock(path: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(str(path), threading.Lock())
+
+
+class SeekableWriter:
+    """Writes seekable zstd to `dst`: data is cut into FRAME_SIZE frames, close() adds the seek table."""
+
+    def __init__(self, dst: BinaryIO, level: int):
+        import zstandard
+
+        self._dst = dst
+        self._cctx = zstandard.ZstdCompressor(level=level)
+        self._buf = bytearray()
+        self.frames: List[Tuple[int, int]] = []
+
+    def _frame(self, chunk: bytes) -> None:
+        # one-shot frames: each records its content size, decompressible alone
+        data = self._cctx.compress(chunk)
+        self._dst.write(data)
+        self.frames.append((len(data), len(chunk)))
+
+    def write(self, data: bytes) -> None:
+        self._buf += data
+        while len(self._buf) >= FRAME_SIZE:
+            self._frame(bytes(self._buf[:FRAME_SIZE]))
+            del self._buf[:FRAME_SIZE]
+
+    def close(self) -> None:
+        if self._buf:
+            self._frame(bytes(self._buf))
+            self._buf.clear()
+        table = b"".join(struct.pack("<II", c, d) for c, d in self.frames)
+        footer = struct.pack("<IBI", len(self.frames), 0, SEEKABLE_MAGIC)
+        self._dst.write(struct.pack("<II", SKIPPABLE_MAGIC, len(table) + len(footer)) + table + footer)
+
+
+def compress_output(path: Path, level: Optional[int] = None) -> bool:
+    """Rewrite `path` as seekable zstd (atomic rename). False when left as it was."""
+    level = compression_level() if level is None else level
+    if not level:
+        return False
+    with _path_lock(path):
+        try:
+            if path.stat().st_size < MIN_SIZE or is_compressed(path):
+                return False
+        except FileNotFoundError:
+            return False
+        tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        try:
+            with path.open("rb") as src, tmp.open("wb") as dst:
+                writer = SeekableWriter(dst, level)
+                while True:
+                    chunk = src.read(FRAME_SIZE)
+                    if not chunk:
+                        break
+                    writer.write(chunk)
+                writer.close()
+            raw, stored = sum(d for _, d in writer.frames), tmp.stat().st_size
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+    logger.info("Compressed %s (%.1f MB -> %.1f MB)", path, raw / 1024 ** 2, stored / 1024 ** 2)
+    return True
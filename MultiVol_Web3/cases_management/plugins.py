@@ -0,0 +1,262 @@
+# plugins.py
+# Plugin plans for each OS / mode, so the web side can dispatch one CLI run per plugin
+# instead of a single opaque `--light|--full` run per dump.
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ..rxconfig import config
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+STATS_PATH = CASES_DIR / "plugin_stats.json"
+
+WINDOWS_LIGHT: List[str] = [
+    "windows.info",
+    "windows.pslist",
+    "windows.pstree",
+    "windows.psscan",
+    "windows.cmdline",
+    "windows.netscan",
+    "windows.netstat",
+    "windows.dlllist",
+    "windows.svcscan",
+    "windows.envars",
+    "windows.filescan",
+    "windows.malfind",
+    "windows.hashdump",
+]
+
+WINDOWS_FULL: List[str] = WINDOWS_LIGHT + [
+    "windows.handles",
+    "windows.vadinfo",
+    "windows.ldrmodules",
+    "windows.modules",
+    "windows.modscan",
+    "windows.driverscan",
+    "windows.ssdt",
+    "windows.callbacks",
+    "windows.mutantscan",
+    "windows.getsids",
+    "windows.privileges",
+    "windows.sessions",
+    "windows.registry.hivelist",
+    "windows.registry.userassist",
+]
+
+# The CLI has no light/full split for linux, every run is the full list
+LINUX_ALL: List[str] = [
+    "linux.pslist",
+    "linux.pstree",
+    "linux.psaux",
+    "linux.bash",
+    "linux.lsof",
+    "linux.sockstat",
+    "linux.envars",
+    "linux.lsmod",
+    "linux.check_modules",
+    "linux.check_syscall",
+    "linux.tty_check",
+    "linux.mountinfo",
+    "linux.elfs",
+    "linux.malfind",
+]
+
+PLUGIN_PLANS: Dict[str, Dict[str, List[str]]] = {
+    "windows": {"light": WINDOWS_LIGHT, "full": WINDOWS_FULL},
+    "linux": {"light": LINUX_ALL, "full": LINUX_ALL},
+}
+
+# Rough wall-clock cost in seconds on a ~8 GB image; only the ordering matters
+EXPECTED_RUNTIME: Dict[str, float] = {
+    "windows.info": 20,
+    "windows.pslist": 25,
+    "windows.pstree": 25,
+    "windows.cmdline": 30,
+    "windows.netstat": 45,
+    "windows.netscan": 90,
+    "windows.psscan": 120,
+    "windows.envars": 60,
+    "windows.svcscan": 60,
+    "windows.hashdump": 40,
+    "windows.sessions": 40,
+    "windows.getsids": 60,
+    "windows.privileges": 60,
+    "windows.modules": 30,
+    "windows.modscan": 120,
+    "windows.driverscan": 120,
+    "windows.ssdt": 40,
+    "windows.callbacks": 60,
+    "windows.mutantscan": 120,
+    "windows.registry.hivelist": 60,
+    "windows.registry.userassist": 90,
+    "windows.dlllist": 180,
+    "windows.ldrmodules": 300,
+    "windows.filescan": 400,
+    "windows.handles": 450,
+    "windows.vadinfo": 500,
+    "windows.malfind": 600,
+    "linux.pslist": 20,
+    "linux.pstree": 20,
+    "linux.psaux": 25,
+    "linux.bash": 40,
+    "linux.envars": 40,
+    "linux.lsmod": 20,
+    "linux.check_modules": 30,
+    "linux.check_syscall": 40,
+    "linux.tty_check": 30,
+    "linux.mountinfo": 60,
+    "linux.sockstat": 90,
+    "linux.lsof": 180,
+    "linux.elfs": 300,
+    "linux.malfind": 400,
+}
+DEFAULT_RUNTIME = 60.0
+
+
+# Priority tiers: lower starts first.
+TRIAGE = 0      # what an analyst looks at first, makes the case useful within minutes
+NORMAL = 1
+BACKGROUND = 2  # slow scans that can finish while the case is already being browsed
+
+DEFAULT_PRIORITIES: Dict[str, Dict[str, int]] = {
+    "windows": {
+        "windows.info": TRIAGE,
+        "windows.pslist": TRIAGE,
+        "windows.pstree": TRIAGE,
+        "windows.cmdline": TRIAGE,
+        "windows.netscan": TRIAGE,
+        "windows.netstat": NORMAL,
+        "windows.psscan": NORMAL,
+        "windows.svcscan": NORMAL,
+        "windows.dlllist": NORMAL,
+        "windows.filescan": BACKGROUND,
+        "windows.malfind": BACKGROUND,
+        "windows.handles": BACKGROUND,
+        "windows.vadinfo": BACKGROUND,
+        "windows.ldrmodules": BACKGROUND,
+        "windows.mutantscan": BACKGROUND,
+    },
+    "linux": {
+        "linux.pslist": TRIAGE,
+        "linux.pstree": TRIAGE,
+        "linux.psaux": TRIAGE,
+        "linux.bash": TRIAGE,
+        "linux.sockstat": TRIAGE,
+        "linux.lsof": NORMAL,
+        "linux.elfs": BACKGROUND,
+        "linux.malfind": BACKGROUND,
+    },
+}
+DEFAULT_PRIORITY = NORMAL
+
+# Weight of the newest sample in the runtime moving average
+_EWMA_ALPHA = 0.3
+_stats_lock = threading.Lock()
+_overrides: Optional[Dict[str, Dict[str, int]]] = None
+
+
+def _priority_overrides() -> Dict[str, Dict[str, int]]:
+    """Per-OS overrides from the JSON file in PLUGIN_PRIORITIES_FILE, e.g. {"windows": {"windows.malfind": 0}}."""
+    global _overrides
+    if _overrides is None:
+        _overrides = {}
+        path = getattr(config, "plugin_priorities_file", None)
+        if path:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    raw = json.load(f)
+                _overrides = {
+                    str(os_name).lower(): {str(p): int(v) for p, v in prios.items()}
+                    for os_name, prios in raw.items()
+                }
+            except Exception:
+                logger.exception("Could not read plugin priorities from %s", path)
+    return _overrides
+
+
+def priority(os_value: str, plugin: str) -> int:
+    os_key = os_value.lower()
+    overrides = _priority_overrides().get(os_key, {})
+    if plugin in overrides:
+        return overrides[plugin]
+    return DEFAULT_PRIORITIES.get(os_key, {}).get(plugin, DEFAULT_PRIORITY)
+
+
+def _read_stats() -> Dict[str, Dict[str, float]]:
+    try:
+        with STATS_PATH.open("r", encoding="utf-8") as f:
+            stats = json.load(f)
+        return stats if isinstance(stats, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def record_runtime(plugin: str, runtime: float) -> None:
+    """Fold a successful run into the historical runtime of `plugin` (cases/plugin_stats.json)."""
+    with _stats_lock:
+        stats = _read_stats()
+        rec = stats.get(plugin) or {}
+        avg = rec.get("avg")
+        rec["avg"] = runtime if avg is None else (1 - _EWMA_ALPHA) * float(avg) + _EWMA_ALPHA * runtime
+        rec["runs"] = int(rec.get("runs", 0)) + 1
+        stats[plugin] = rec
+        STATS_PATH.parent.mkdir(parents=True, exist_ok=True)
+        tmp = STATS_PATH.with_suffix(".json.tmp")
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=4)
+        os.replace(tmp, STATS_PATH)
+
+
+def plan_plugins(os_value: str, mode_value: str) -> List[str]:
+    """Plugins to run for a dump of `os_value` in `mode_value` (empty if the OS is unknown)."""
+    modes = PLUGIN_PLANS.get(os_value.lower(), {})
+    return list(modes.get(mode_value.lower(), modes.get("light", [])))
+
+
+def expected_runtime(plugin: str, stats: Optional[Dict[str, Dict[str, float]]] = None) -> float:
+    """Historical average runtime when we have one, else the static estimate."""
+    rec = (stats if stats is not None else _read_stats()).get(plugin) or {}
+    if rec.get("avg") is not None:
+        return float(rec["avg"])
+    return EXPECTED_RUNTIME.get(plugin, DEFAULT_RUNTIME)
+
+
+def dispatch_key(os_value: str, plugin: str, stats: Optional[Dict[str, Dict[str, float]]] = None) -> tuple:
+    """Sort key for the run queue.
+
+    Lower priority tiers go first. Inside the triage tier the fastest plugins lead (time to
+    first insight); the other tiers are longest-expected-runtime-first so slow scans don't
+    end up alone on the pool at the end of the run.
+    """
+    tier = priority(os_value, plugin)
+    runtime = expected_runtime(plugin, stats)
+    return (tier, runtime if tier <= TRIAGE else -runtime, plugin)
+
+
+def schedule(os_value: str, plugins: List[str]) -> List[str]:
+    stats = _read_stats()
+    return sorted(plugins, key=lambda p: dispatch_key(os_value, p, stats))
+
+
+def dump_tag(upload_name: str) -> str:
+    """Dump name as it appears in per-dump output names (no dots: the label is after the last one)."""
+    return re.sub(r"[^A-Za-z0-9_-]", "_", Path(str(upload_name)).name)
+
+
+def output_filename(plugin: str, upload_name: str = "") -> str:
+    """Name of the JSON the CLI writes in volatility3_output for `plugin`.
+
+    With `upload_name` (cases of several dumps), the name the output is kept under in the
+    case: `<plugin>@<dump tag>_output.json`, one per dump.
+    """
+    if upload_name:
+        return f"{plugin}@{dump_tag(upload_name)}_output.json"
+    return f"{plugin}_output.json"
@@ -0,0 +1,184 @@
+# result_cache.py
+# Reuse of plugin outputs across cases. A finished `*_output.json` is kept (hard link) under
+# cases/.result_cache keyed by (dump SHA-256, plugin, plugin options, Volatility/symbols
+# version); a new case on a known dump links the cached output instead of running the plugin.
+# Entries still linked into a case cost no extra disk; the ones only the cache holds (their
+# cases were deleted) are trimmed least-recently-used first to RESULT_CACHE_GB.
+from __future__ import annotations
+
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from uuid import uuid4
+
+from ..rxconfig import config
+from ..uploads import store
+from .manifest import probe_failure
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = Path(__file__).parent.parent / "cases" / ".result_cache"
+PROFILES_DIR = Path(__file__).parent.parent / "profiles_json"
+PRUNE_INTERVAL = 3600.0
+
+_prune_lock = threading.Lock()
+
+
+def cache_budget_bytes() -> int:
+    try:
+        return int(float(getattr(config, "result_cache_gb", 20)) * 1024 ** 3)
+    except (TypeError, ValueError):
+        return 20 * 1024 ** 3
+
+
+@functools.lru_cache(maxsize=1)
+def volatility_version() -> str:
+    """VOLATILITY_VERSION when set, else the id of the local `volatility3` docker image."""
+    configured = getattr(config, "volatility_version", None)
+    if configured:
+        return str(configured)
+    try:
+        import docker
+
+        return docker.from_env().images.get("volatility3").id
+    except Exception:
+        logger.warning("Could not resolve the volatility3 image id, result cache keys use 'volatility3'")
+        return "volatility3"
+
+
+def symbols_version() -> str:
+    """Fingerprint of the custom symbol set (names, sizes, mtimes of profiles_json)."""
+    digest = hashlib.sha256()
+    if PROFILES_DIR.exists():
+        for p in sorted(PROFILES_DIR.rglob("*")):
+            rel = p.relative_to(PROFILES_DIR)
+            # skip upload temp files (.partial/*.part) and other hidden entries
+            if any(part.startswith(".") for part in rel.parts):
+                continue
+            if p.is_file():
+                st = p.stat()
+                digest.update(f"{rel}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def cache_key(dump_sha256: str, plugin: str, options: Dict[str, Any]) -> str:
+    parts = {
+        "dump": dump_sha256,
+        "plugin": plugin,
+        "options": options,
+        "volatility": volatility_version(),
+        # only linux runs use the uploaded symbol tables
+        "symbols": symbols_version() if options.get("os") == "linux" else "",
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+
+def key_for_dump(upload_name: str, plugin: str, options: Dict[str, Any]) -> Optional[str]:
+    """Cache key for a dump in uploaded_files, None when its hash is unknown."""
+    record = store.lookup_name(upload_name)
+    if not record or not record.get("sha256"):
+        return None
+    return cache_key(record["sha256"], plugin, options)
+
+
+def _entry(key: str) -> Path:
+    return CACHE_DIR / key[:2] / f"{key}.json"
+
+
+def _used_marker(entry: Path) -> Path:
+    # the entry's own mtime is the one of the case outputs linked to it: not touched
+    return entry.with_suffix(".used")
+
+
+def _mark_used(entry: Path) -> None:
+    try:
+        _used_marker(entry).touch()
+    except OSError:
+        pass
+
+
+def _last_used(entry: Path, st: os.stat_result) -> float:
+    try:
+        return _used_marker(entry).stat().st_mtime
+    except FileNotFoundError:
+        return st.st_mtime
+
+
+def prune() -> int:
+    """Drop the least recently used entries only the cache holds while they are over budget;
+    returns how many were removed."""
+    with _prune_lock:
+        orphans = []
+        for entry in CACHE_DIR.glob("*/*.json"):
+            try:
+                st = entry.stat()
+            except FileNotFoundError:
+                continue
+            # still linked into a case: removing it frees nothing
+            if st.st_nlink == 1:
+                orphans.append((_last_used(entry, st), st.st_size, entry))
+        total = sum(size for _, size, _ in orphans)
+        budget = cache_budget_bytes()
+        removed = 0
+        for _, size, entry in sorted(orphans, key=lambda o: o[0]):
+            if total <= budget:
+                break
+            entry.unlink(missing_ok=True)
+            _used_marker(entry).unlink(missing_ok=True)
+            total -= size
+            removed += 1
+            logger.info("Evicted cached output %s", entry.name)
+    return removed
+
+
+async def prune_result_cache() -> None:
+    """Lifespan task: keep what deleted cases left in the result cache under RESULT_CACHE_GB."""
+    while True:
+        removed = await asyncio.to_thread(prune)
+        if removed:
+            logger.info("Evicted %s cached output(s) of deleted cases", removed)
+        await asyncio.sleep(PRUNE_INTERVAL)
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = dest.with_name(f".{dest.name}.{uuid4().hex}.tmp")
+    try:
+        os.link(src, tmp)
+    except OSError:
+        shutil.copy2(src, tmp)
+    os.replace(tmp, dest)
+
+
+def _is_cacheable(path: Path) -> bool:
+    try:
+        return not probe_failure(path)
+    except OSError:
+        return False
+
+
+def restore(key: str, dest: Path) -> bool:
+    """Put the cached output for `key` at `dest`. False on a cache miss."""
+    entry = _entry(key)
+    if not entry.exists():
+        return False
+    _link_or_copy(entry, dest)
+    _mark_used(entry)
+    return True
+
+
+def save(key: str, output: Path) -> bool:
+    """Remember a successful output under `key`."""
+    if not _is_cacheable(output):
+        return False
+    _link_or_copy(output, _entry(key))
+    _mark_used(_entry(key))
+    return True
@@ -0,0 +1,241 @@
+# tiering.py
+# Cold cases. A case nobody opened for COLD_AFTER_DAYS has its module outputs packed into one
+# seekable zstd file (cold_outputs.zst, see outputs.py) with an index of where each output sits
+# (cold_outputs.json); the outputs themselves are removed. case_details.json, plugin_runs.json
+# and the manifest stay as they are, so /cases lists and checks the case without noticing.
+# Opening a module restores just that output from the pack; once every output is back the pack
+# is deleted and the case is hot again.
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+from uuid import uuid4
+
+from ..rxconfig import config
+from . import catalog
+from .manifest import OUTPUT_DIR, OUTPUT_SUFFIX, update_entries
+from .outputs import SeekableWriter, compress_output, compression_level, open_output
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+PACK_NAME = "cold_outputs.zst"
+INDEX_NAME = "cold_outputs.json"
+ACCESS_NAME = ".last_access"
+PACK_LEVEL = 9
+COPY_CHUNK = 4 * 1024 * 1024
+# the access marker is touched at most this often
+ACCESS_RESOLUTION = 3600.0
+CHECK_INTERVAL = 3600.0
+
+_locks: Dict[str, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _case_lock(case_dir: Path) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(str(case_dir), threading.Lock())
+
+
+def cold_after_seconds() -> float:
+    try:
+        days = float(getattr(config, "cold_after_days", 0) or 0)
+    except (TypeError, ValueError):
+        days = 0
+    return days * 86400
+
+
+def touch(case_dir: Path) -> None:
+    """Record an access to the case (opening it, exporting it, running plugins on it)."""
+    marker = case_dir / ACCESS_NAME
+    try:
+        if time.time() - marker.stat().st_mtime < ACCESS_RESOLUTION:
+            return
+    except FileNotFoundError:
+        pass
+    try:
+        marker.touch()
+    except OSError:
+        pass
+
+
+def last_access(case_dir: Path) -> float:
+    """Latest of: access marker, case details (written by every run), newest output."""
+    latest = 0.0
+    for path in (case_dir / ACCESS_NAME, case_dir / "case_details.json"):
+        try:
+            latest = max(latest, path.stat().st_mtime)
+        except FileNotFoundError:
+            pass
+    out_dir = case_dir / OUTPUT_DIR
+    if out_dir.is_dir():
+        for entry in os.scandir(out_dir):
+            latest = max(latest, entry.stat().st_mtime)
+    return latest
+
+
+def _read_index(case_dir: Path) -> Dict[str, Dict[str, Any]]:
+    try:
+        with (case_dir / INDEX_NAME).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def packed_outputs(case_dir: Path) -> List[str]:
+    """Outputs of the case that only exist in its cold pack."""
+    out_dir = case_dir / OUTPUT_DIR
+    return sorted(name for name in _read_index(case_dir) if not (out_dir / name).exists())
+
+
+def is_cold(case_dir: Path) -> bool:
+    return (case_dir / INDEX_NAME).exists()
+
+
+def freeze(case_dir: Path) -> bool:
+    """Pack the outputs of `case_dir` and remove them. False when there was nothing to do."""
+    out_dir = case_dir / OUTPUT_DIR
+    with _case_lock(case_dir):
+        if is_cold(case_dir) or not out_dir.is_dir():
+            return False
+        outputs = sorted(p for p in out_dir.iterdir() if p.name.endswith(OUTPUT_SUFFIX) and p.is_file())
+        if not outputs:
+            return False
+        index: Dict[str, Dict[str, Any]] = {}
+        tmp = case_dir / f".{PACK_NAME}.{uuid4().hex}.tmp"
+        try:
+            with tmp.open("wb") as dst:
+                writer = SeekableWriter(dst, PACK_LEVEL)
+                offset = 0
+                for path in outputs:
+                    st = path.stat()
+                    size = 0
+                    # outputs stored compressed are packed decompressed: one zstd layer
+                    with open_output(path) as src:
+                        while True:
+                            chunk = src.read(COPY_CHUNK)
+                            if not chunk:
+                                break
+                            writer.write(chunk)
+                            size += len(chunk)
+                    index[path.name] = {"offset": offset, "size": size, "mtime": st.st_mtime, "bytes": st.st_size}
+                    offset += size
+                writer.close()
+            os.replace(tmp, case_dir / PACK_NAME)
+        finally:
+            tmp.unlink(missing_ok=True)
+        # the index makes the case cold: written only once the pack is complete
+        index_tmp = case_dir / f"{INDEX_NAME}.tmp"
+        with index_tmp.open("w", encoding="utf-8") as f:
+            json.dump(index, f, indent=4)
+        os.replace(index_tmp, case_dir / INDEX_NAME)
+        update_entries(case_dir, {name: {"cold": True} for name in index})
+        for path in outputs:
+            st = path.stat()
+            # rewritten meanwhile: the file on disk wins over its packed copy
+            if st.st_mtime == index[path.name]["mtime"] and st.st_size == index[path.name]["bytes"]:
+                path.unlink()
+    logger.info("Case %s is now cold (%s outputs packed)", case_dir.name, len(index))
+    return True
+
+
+def _drop_pack(case_dir: Path) -> None:
+    (case_dir / INDEX_NAME).unlink(missing_ok=True)
+    (case_dir / PACK_NAME).unlink(missing_ok=True)
+    logger.info("Case %s is hot again", case_dir.name)
+
+
+def restore_output(path: Path) -> bool:
+    """Bring one packed output back to `path`; True when it exists afterwards."""
+    if path.exists():
+        return True
+    case_dir = path.parent.parent
+    with _case_lock(case_dir):
+        if path.exists():
+            return True
+        index = _read_index(case_dir)
+        entry = index.get(path.name)
+        if entry is None:
+            return False
+        tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        try:
+            with open_output(case_dir / PACK_NAME) as src, tmp.open("wb") as dst:
+                src.seek(entry["offset"])
+                remaining = entry["size"]
+                while remaining:
+                    chunk = src.read(min(COPY_CHUNK, remaining))
+                    if not chunk:
+                        raise EOFError(f"{PACK_NAME} of {case_dir.name} is truncated")
+                    dst.write(chunk)
+                    remaining -= len(chunk)
+            os.utime(tmp, (entry["mtime"], entry["mtime"]))
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+        if compression_level():
+            compress_output(path)
+        st = path.stat()
+        # same content as when it was summarized: only the file identity changes
+        update_entries(case_dir, {path.name: {"cold": None, "mtime": st.st_mtime, "bytes": st.st_size}})
+        if all((path.parent / name).exists() for name in index):
+            _drop_pack(case_dir)
+    logger.info("Restored %s of cold case %s", path.name, case_dir.name)
+    return True
+
+
+def thaw(case_dir: Path) -> None:
+    """Restore every packed output (exports, re-runs)."""
+    for name in packed_outputs(case_dir):
+        restore_output(case_dir / OUTPUT_DIR / name)
+    with _case_lock(case_dir):
+        # every output was rewritten meanwhile (a re-run): restore_output never ran to drop it
+        if is_cold(case_dir) and not packed_outputs(case_dir):
+            _drop_pack(case_dir)
+
+
+def _freeze_idle() -> int:
+    threshold = cold_after_seconds()
+    if not threshold:
+        return 0
+    # not at module level: jobs -> handle_case -> tiering
+    from . import jobs
+
+    busy = {name.replace(" ", "_") for name in jobs.active_cases()}
+    frozen = 0
+    for entry in os.scandir(CASES_DIR):
+        case_dir = Path(entry.path)
+        if not entry.is_dir() or entry.name.startswith(".") or entry.name in busy:
+            continue
+        if not (case_dir / "case_details.json").exists() or is_cold(case_dir):
+            continue
+        if time.time() - last_access(case_dir) < threshold:
+            continue
+        try:
+            if freeze(case_dir):
+                frozen += 1
+                catalog.mark_dirty(case_dir.name)
+        except Exception:
+            logger.exception("Could not pack case %s", case_dir.name)
+    return frozen
+
+
+async def tier_cases() -> None:
+    """Lifespan task: pack cases idle for COLD_AFTER_DAYS (no-op when it isn't set)."""
+    if not cold_after_seconds():
+        return
+    try:
+        import zstandard  # noqa: F401
+    except ImportError:
+        logger.warning("zstandard is not installed, cold-case tiering is disabled")
+        return
+    while True:
+        await asyncio.sleep(CHECK_INTERVAL)
+        frozen = await asyncio.to_thread(_freeze_idle)
+        if frozen:
+            logger.info("Packed %s idle cases", frozen)
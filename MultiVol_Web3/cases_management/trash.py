@@ -0,0 +1,127 @@
+# trash.py
+# Case deletion in two steps: the case folder is renamed into cases/.trash (instant, atomic on the
+# same filesystem) so the handler returns at once and the case is gone from the catalog, then a
+# background worker removes the trash at a capped rate (TRASH_RATE_MB per second). Huge files are
+# truncated in steps before being unlinked, so freeing their blocks doesn't saturate a slow disk
+# either. Whatever is still in the trash after a restart is removed by the next run.
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import stat
+import time
+from pathlib import Path
+from typing import Optional
+from uuid import uuid4
+
+from ..rxconfig import config
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+TRASH_DIR = CASES_DIR / ".trash"
+
+# unit of truncation of big files
+TRUNCATE_STEP = 256 * 1024 * 1024
+# what unlinking a file / removing a folder costs against the rate (metadata I/O)
+ENTRY_COST = 64 * 1024
+
+_wake: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def rate_bytes() -> int:
+    try:
+        mb = float(getattr(config, "trash_rate_mb", 256))
+    except (TypeError, ValueError):
+        mb = 256
+    return int(mb * 1024 * 1024) if mb > 0 else 0
+
+
+def move_to_trash(path: Path) -> Optional[Path]:
+    """Rename `path` into the trash; None when it doesn't exist. Removal happens later."""
+    TRASH_DIR.mkdir(parents=True, exist_ok=True)
+    dest = TRASH_DIR / f"{path.name}-{uuid4().hex[:8]}"
+    try:
+        os.replace(path, dest)
+    except FileNotFoundError:
+        return None
+    if _wake is not None and _loop is not None:
+        # also called from worker threads (case imports): asyncio.Event isn't thread-safe
+        _loop.call_soon_threadsafe(_wake.set)
+    return dest
+
+
+class _Throttle:
+    def __init__(self, rate: int):
+        self.rate = rate
+        self.start = time.monotonic()
+        self.spent = 0
+
+    def spend(self, amount: int) -> None:
+        if not self.rate:
+            return
+        self.spent += amount
+        ahead = self.spent / self.rate - (time.monotonic() - self.start)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+def _remove_file(path: str, throttle: _Throttle) -> None:
+    try:
+        st = os.lstat(path)
+        # only a file's last link owns its blocks: outputs hard-linked with the result cache
+        # (and with the cases restored from it) are just unlinked, never truncated
+        size = st.st_size if st.st_nlink == 1 else 0
+        if size > TRUNCATE_STEP and stat.S_ISREG(st.st_mode):
+            # give the blocks back a slice at a time
+            with open(path, "r+b") as f:
+                while size > TRUNCATE_STEP:
+                    size -= TRUNCATE_STEP
+                    f.truncate(size)
+                    throttle.spend(TRUNCATE_STEP)
+        os.unlink(path)
+    except FileNotFoundError:
+        return
+    throttle.spend(size + ENTRY_COST)
+
+
+def remove_tree(root: Path) -> None:
+    """rmtree at the configured rate."""
+    throttle = _Throttle(rate_bytes())
+    if root.is_symlink() or not root.is_dir():
+        _remove_file(str(root), throttle)
+        return
+    for dirpath, dirnames, filenames in os.walk(root, topdown=False):
+        for name in filenames:
+            _remove_file(os.path.join(dirpath, name), throttle)
+        for name in dirnames:
+            full = os.path.join(dirpath, name)
+            if os.path.islink(full):
+                _remove_file(full, throttle)
+        try:
+            os.rmdir(dirpath)
+        except FileNotFoundError:
+            pass
+        throttle.spend(ENTRY_COST)
+
+
+async def purge_trash() -> None:
+    """Lifespan task: empty the trash in the background, one entry at a time."""
+    global _wake, _loop
+    _loop = asyncio.get_running_loop()
+    _wake = asyncio.Event()
+    while True:
+        _wake.clear()
+        entries = sorted(TRASH_DIR.iterdir()) if TRASH_DIR.is_dir() else []
+        for entry in entries:
+            started = time.monotonic()
+            try:
+                await asyncio.to_thread(remove_tree, entry)
+            except Exception:
+                logger.exception("Could not remove %s from the trash", entry)
+                continue
+            logger.info("Removed %s from the trash in %.1fs", entry.name, time.monotonic() - started)
+        # returns right away when something was trashed meanwhile
+        await _wake.wait()
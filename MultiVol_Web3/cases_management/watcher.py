@@ -0,0 +1,148 @@
+# watcher.py
+# Watches cases/ (inotify through watchfiles) and ingests every module output as soon as the CLI
+# has finished writing it, so /cases and /sheet see results while a long run is still going.
+# Every change also marks its case dirty in the in-memory case catalog (catalog.py).
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from watchfiles import Change, awatch
+
+from . import catalog
+from .manifest import PROBE_FULL_MAX, ingest_output, is_module_output, read_head_tail
+from .outputs import open_output, output_size
+
+logger = logging.getLogger(__name__)
+
+CASES_DIR = Path(__file__).parent.parent / "cases"
+
+# An output is considered complete once its size hasn't moved for this long and it parses
+SETTLE_SECONDS = 2.0
+# ...or, if it never parses, once it has been stable this long (ingested as a failure)
+GIVE_UP_SECONDS = 120.0
+
+# case slug -> version, bumped on every ingested output
+_case_versions: Dict[str, int] = {}
+_changed: Optional[asyncio.Condition] = None
+
+
+def case_version(slug: str) -> int:
+    return _case_versions.get(slug, 0)
+
+
+async def wait_for_case_change(slug: str, seen_version: int, timeout: float) -> int:
+    """Block until the case moves past `seen_version` (or timeout) and return its version."""
+    if _changed is None:
+        await asyncio.sleep(timeout)
+        return case_version(slug)
+    async with _changed:
+        try:
+            await asyncio.wait_for(
+                _changed.wait_for(lambda: case_version(slug) != seen_version), timeout
+            )
+        except asyncio.TimeoutError:
+            pass
+    return case_version(slug)
+
+
+async def _notify(slug: str) -> None:
+    _case_versions[slug] = case_version(slug) + 1
+    if _changed is not None:
+        async with _changed:
+            _changed.notify_all()
+
+
+def _looks_complete(path: Path) -> bool:
+    # small outputs are parsed, big ones only need their closing bracket
+    try:
+        size = output_size(path)
+        if size > PROBE_FULL_MAX:
+            return read_head_tail(path, size)[1].rstrip()[-1:] in ("]", "}")
+        with open_output(path, text=True) as f:
+            json.load(f)
+        return True
+    except (OSError, ValueError):
+        return False
+
+
+def _case_folder(path: Path) -> Optional[str]:
+    try:
+        parts = path.relative_to(CASES_DIR).parts
+    except ValueError:
+        return None
+    return parts[0] if parts and not parts[0].startswith(".") else None
+
+
+def _watch_filter(change: Change, path: str) -> bool:
+    p = Path(path)
+    if _case_folder(p) is None:
+        # caches and import staging (dot folders)
+        return False
+    # module outputs, case details, and case folders appearing / going away
+    return is_module_output(p) or p.name == "case_details.json" or (p.parent == CASES_DIR and change != Change.modified)
+
+
+async def watch_cases() -> None:
+    """Lifespan task: ingest module outputs of every case as they are written."""
+    global _changed
+    _changed = asyncio.Condition()
+    CASES_DIR.mkdir(parents=True, exist_ok=True)
+    await asyncio.to_thread(catalog.build)
+
+    # path -> (size seen, monotonic time it was last seen changing)
+    pending: Dict[Path, Tuple[int, float]] = {}
+    wake = asyncio.Event()
+
+    async def _settle() -> None:
+        while True:
+            if not pending:
+                wake.clear()
+                await wake.wait()
+            await asyncio.sleep(SETTLE_SECONDS / 2)
+            now = time.monotonic()
+            for path, (size, since) in list(pending.items()):
+                try:
+                    current = path.stat().st_size
+                except FileNotFoundError:
+                    pending.pop(path, None)
+                    continue
+                if current != size:
+                    pending[path] = (current, now)
+                    continue
+                if now - since < SETTLE_SECONDS:
+                    continue
+                if not await asyncio.to_thread(_looks_complete, path) and now - since < GIVE_UP_SECONDS:
+                    continue
+                pending.pop(path, None)
+                try:
+                    await asyncio.to_thread(ingest_output, path)
+                except Exception:
+                    logger.exception("Failed to ingest %s", path)
+                    continue
+                catalog.mark_dirty(path.parent.parent.name)
+                await _notify(path.parent.parent.name)
+
+    settler = asyncio.create_task(_settle())
+    try:
+        async for changes in awatch(CASES_DIR, watch_filter=_watch_filter, recursive=True):
+            now = time.monotonic()
+            for change, raw in changes:
+                path = Path(raw)
+                folder = _case_folder(path)
+                if folder is not None and (change == Change.deleted or not is_module_output(path)):
+                    # outputs are marked once ingested, everything else right away
+                    catalog.mark_dirty(folder)
+                if change == Change.deleted or not is_module_output(path):
+                    continue
+                try:
+                    pending[path] = (path.stat().st_size, now)
+                except FileNotFoundError:
+                    continue
+            wake.set()
+    finally:
+        settler.cancel()
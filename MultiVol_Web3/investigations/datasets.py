@@ -0,0 +1,191 @@
+# datasets.py
+# Module outputs as shared, immutable datasets: one per output file per process, whatever the
+# number of /sheet tabs showing it. A TableState only keeps the key of its dataset and a
+# Selection, the indices of the rows its filters and sort select (see table_state.py); sessions
+# with the same query share it. Both are accounted in memory.py and may be evicted at any
+# time: a dataset is read again, a selection recomputed, on next access.
+from __future__ import annotations
+
+import json
+import logging
+import sys
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from ..cases_management.outputs import open_output
+from . import memory
+
+logger = logging.getLogger(__name__)
+
+
+class Dataset:
+    """Rows of one module output, cells as strings, in `columns` order (read-only)."""
+
+    __slots__ = ("key", "version", "headers", "columns", "index", "rows", "nbytes")
+
+    def __init__(self, key: str, version: str, rows_in: Any):
+        self.key = key
+        self.version = version
+        dicts = [row for row in rows_in if isinstance(row, dict)]
+        # headers as the table shows them (first row); columns: every key seen
+        self.headers: Tuple[str, ...] = tuple(dicts[0].keys()) if dicts else ()
+        columns: Dict[str, int] = {h: i for i, h in enumerate(self.headers)}
+        for row in dicts:
+            for k in row:
+                if k not in columns:
+                    columns[k] = len(columns)
+        self.columns: Tuple[str, ...] = tuple(columns)
+        self.index = columns
+        self.rows: Tuple[Tuple[str, ...], ...] = tuple(
+            tuple("" if row.get(c) is None else str(row[c]) for c in self.columns)
+            for row in dicts
+        )
+        # estimate for the memory accountant: row tuples + distinct cell strings
+        self.nbytes = sys.getsizeof(self.rows) + sum(
+            sys.getsizeof(row) + sum(sys.getsizeof(v) for v in row if v) for row in self.rows
+        )
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def cell(self, row: Tuple[str, ...], column: str) -> str:
+        i = self.index.get(column)
+        return row[i] if i is not None and i < len(row) else ""
+
+
+EMPTY = Dataset("", "", [])
+
+_lock = threading.Lock()
+_datasets: Dict[str, Dataset] = {}
+# one loader at a time per key: concurrent tabs opening the same module share the load
+_loading: Dict[str, threading.Lock] = {}
+
+
+def version_of(path: Path) -> str:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return ""
+    return f"{st.st_mtime_ns}-{st.st_size}"
+
+
+def _read(path: Path, version: str) -> Dataset:
+    try:
+        # outputs may be stored zstd-compressed (cases_management/outputs.py)
+        with open_output(path, text=True) as f:
+            data = json.load(f)
+    except Exception:
+        data = [{"error": "Error while treating file", "filename": str(path)}]
+    if isinstance(data, dict) and isinstance(data.get("data"), list):
+        data = data["data"]
+    if not isinstance(data, list):
+        data = []
+    return Dataset(str(path), version, data)
+
+
+def _forget(key: str, dataset: Dataset) -> None:
+    with _lock:
+        if _datasets.get(key) is dataset:
+            del _datasets[key]
+
+
+def peek(key: str, version: str = "") -> Optional[Dataset]:
+    """The dataset when it is loaded and current, else None: never reads (computed vars)."""
+    if not key:
+        return EMPTY
+    with _lock:
+        dataset = _datasets.get(key)
+    if dataset is None or (version and dataset.version != version):
+        return None
+    memory.touch(("dataset", key))
+    return dataset
+
+
+def get(key: str, version: str = "") -> Dataset:
+    """The shared dataset of the output at `key`, read from disk when missing (evicted) or
+    outdated."""
+    if not key:
+        return EMPTY
+    with _lock:
+        dataset = _datasets.get(key)
+        if dataset is not None and (not version or dataset.version == version):
+            memory.touch(("dataset", key))
+            return dataset
+        loader = _loading.setdefault(key, threading.Lock())
+    with loader:
+        path = Path(key)
+        current = version_of(path)
+        with _lock:
+            dataset = _datasets.get(key)
+            if dataset is not None and dataset.version == current:
+                return dataset
+        if not current:
+            return EMPTY
+        dataset = _read(path, current)
+        with _lock:
+            _datasets[key] = dataset
+        logger.info("Loaded dataset %s (%s rows, ~%.1f MB)", path.name, len(dataset), dataset.nbytes / 1024 ** 2)
+        memory.add(("dataset", key), "dataset", dataset.nbytes, lambda: _forget(key, dataset))
+        return dataset
+
+
+class Selection:
+    """Indices of the rows of a dataset a query selects; recomputed when evicted or when the
+    dataset changed. Only the query is pickled with the session state.
+
+    indices() may read the dataset and run the query: call it off the event loop.
+    """
+
+    def __init__(self, key: str, version: str, query: Any, compute: Callable[[Dataset, Any], array]):
+        self.key, self.version, self.query, self.compute = key, version, query, compute
+        self._indices: Optional[array] = None
+        self._lock = threading.Lock()
+
+    def _memory_key(self) -> Hashable:
+        return ("selection", id(self))
+
+    def indices(self) -> array:
+        with self._lock:
+            indices = self._indices
+            dataset = get(self.key, self.version)
+            if indices is not None and dataset.version == self.version:
+                memory.touch(self._memory_key())
+                return indices
+            indices = self.compute(dataset, self.query)
+            self._indices, self.version = indices, dataset.version
+        memory.add(self._memory_key(), "selection", sys.getsizeof(indices), self._evict)
+        return indices
+
+    def peek(self) -> Optional[array]:
+        """The indices when computed and current, else None: never computes (computed vars)."""
+        indices = self._indices
+        if indices is None or peek(self.key, self.version) is None:
+            return None
+        memory.touch(self._memory_key())
+        return indices
+
+    def _evict(self) -> None:
+        self._indices = None
+        with _lock:
+            if _selections.get((self.key, self.query.key())) is self:
+                del _selections[(self.key, self.query.key())]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"key": self.key, "version": self.version, "query": self.query, "compute": self.compute}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(**state)
+
+
+_selections: Dict[Tuple[str, Hashable], Selection] = {}
+
+
+def selection(key: str, version: str, query: Any, compute: Callable[[Dataset, Any], array]) -> Selection:
+    """The shared Selection of `query` (which needs a hashable `key()`) over dataset `key`."""
+    with _lock:
+        found = _selections.get((key, query.key()))
+        if found is None or found.version != version:
+            found = _selections[(key, query.key())] = Selection(key, version, query, compute)
+        return found
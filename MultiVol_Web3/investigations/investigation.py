@@ -5,7 +5,28 @@ import glob
 from pathlib import Path
 import re
 import reflex as rx
+import time
 from urllib.parse import urlparse,parse_qs,urlunparse
+from ..cases_management import tiering
+from ..cases_management.watcher import case_version, wait_for_case_change
+
+# stop following a case for new modules after this long without any
+FOLLOW_IDLE_SECONDS = 15 * 60
+
+
+def _module_list(cases_path) -> list[dict[str, str]]:
+    files = glob.glob(str(cases_path / "*.json"))   # <- robust glob
+    # a cold case lists the outputs still in its pack too (restored when opened)
+    files += [str(cases_path / name) for name in tiering.packed_outputs(cases_path.parent)]
+    cleaned = []
+    cleaned.append({"value": "Home", "label": "Home"})
+    for f in sorted(files):
+        m = re.search(r"\.(.+?)_output\.json$", f)
+        label = m.group(1) if m else Path(f).stem
+        cleaned.append({"value": f, "label": label})
+    return cleaned
+
+
 class InvestigationState(rx.State):
     all_modules: list[dict[str, str]] = []   # [{value: path, label: cleaned}]
     active_tab: str = ""                      # matches tabs `value`
@@ -33,14 +54,26 @@ class InvestigationState(rx.State):
             return rx.redirect(f"{current_url.path}?module={value}")
 
     def load_modules(self):
-        files = glob.glob(str(self.return_cases_path() / "*.json"))   # <- robust glob
-        cleaned = []
-        cleaned.append({"value": "Home", "label": "Home"})
-        for f in files:
-            m = re.search(r"\.(.+?)_output\.json$", f)
-            label = m.group(1) if m else Path(f).stem
-            cleaned.append({"value": f, "label": label})
-        self.all_modules = cleaned
+        self.all_modules = _module_list(self.return_cases_path())
+
+    @rx.event(background=True)
+    async def follow_case(self):
+        """Add the tabs of modules ingested by the case watcher while this page is open."""
+        async with self:
+            cases_path = self.return_cases_path()
+        if not cases_path:
+            return
+        slug = cases_path.parent.name
+        seen = case_version(slug)
+        last_change = time.monotonic()
+        while time.monotonic() - last_change < FOLLOW_IDLE_SECONDS:
+            version = await wait_for_case_change(slug, seen, timeout=30)
+            if version == seen:
+                continue
+            seen = version
+            last_change = time.monotonic()
+            async with self:
+                self.all_modules = _module_list(cases_path)
 
 
     @staticmethod
@@ -766,6 +799,12 @@ def table() -> rx.Component:
 
         _settings_panel(),
 
+        # what the table shows was evicted from memory (or is a new query): load it off the event loop
+        rx.cond(
+            TableState.data_missing,
+            rx.box(rx.spinner(), on_mount=TableState.reload_data, padding_bottom="1em"),
+        ),
+
         # table
         rx.table.root(
             rx.table.header(
@@ -854,5 +893,5 @@ def table() -> rx.Component:
             justify="between",
         ),
         width="100%",
-        on_mount=InvestigationState.load_modules,
+        on_mount=[InvestigationState.load_modules, InvestigationState.follow_case],
     )
@@ -0,0 +1,136 @@
+# memory.py
+# Memory accountant of what /sheet keeps loaded: the shared datasets and the row selections
+# derived from them (datasets.py). Every entry has an estimated size and an evict callback;
+# past TABLE_MEMORY_MB the least recently used entries are evicted, and entries unused for
+# TABLE_IDLE_MINUTES are evicted anyway. Evicting is always safe: both kinds are rebuilt from
+# disk / from their query on next access. Usage is served at GET /api/memory.
+from __future__ import annotations
+
+import asyncio
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Tuple
+
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from ..rxconfig import config
+
+logger = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 60.0
+
+_lock = threading.Lock()
+# key -> (kind, bytes, last use, evict); least recently used first
+_entries: "OrderedDict[Hashable, Tuple[str, int, float, Callable[[], None]]]" = OrderedDict()
+_total = 0
+_evictions = 0
+
+
+def budget_bytes() -> int:
+    try:
+        return int(float(getattr(config, "table_memory_mb", 2048)) * 1024 * 1024)
+    except (TypeError, ValueError):
+        return 2048 * 1024 * 1024
+
+
+def idle_seconds() -> float:
+    try:
+        return float(getattr(config, "table_idle_minutes", 30)) * 60
+    except (TypeError, ValueError):
+        return 30 * 60.0
+
+
+def _evict(victims: List[Tuple[Hashable, str, int, Callable[[], None]]], reason: str) -> None:
+    # callbacks run outside the lock: they may take the registries' own locks
+    for key, kind, size, evict in victims:
+        try:
+            evict()
+        except Exception:
+            logger.exception("Could not evict %s", key)
+        logger.info("Evicted %s %s (%.1f MB, %s)", kind, key[1] if isinstance(key, tuple) else key, size / 1024 ** 2, reason)
+
+
+def _pop(key: Hashable) -> Tuple[Hashable, str, int, Callable[[], None]]:
+    global _total, _evictions
+    kind, size, _, evict = _entries.pop(key)
+    _total -= size
+    _evictions += 1
+    return key, kind, size, evict
+
+
+def add(key: Hashable, kind: str, size: int, evict: Callable[[], None]) -> None:
+    """Account `size` bytes under `key` (replacing a previous entry), then enforce the budget."""
+    global _total
+    victims = []
+    with _lock:
+        previous = _entries.pop(key, None)
+        if previous is not None:
+            _total -= previous[1]
+        _entries[key] = (kind, size, time.monotonic(), evict)
+        _total += size
+        budget = budget_bytes()
+        # the entry just added stays, even alone over budget
+        while _total > budget and len(_entries) > 1:
+            victims.append(_pop(next(iter(_entries))))
+    _evict(victims, "over budget")
+
+
+def touch(key: Hashable) -> None:
+    with _lock:
+        entry = _entries.get(key)
+        if entry is not None:
+            _entries[key] = (entry[0], entry[1], time.monotonic(), entry[3])
+            _entries.move_to_end(key)
+
+
+def remove(key: Hashable) -> None:
+    global _total
+    with _lock:
+        entry = _entries.pop(key, None)
+        if entry is not None:
+            _total -= entry[1]
+
+
+def evict_idle() -> int:
+    limit = idle_seconds()
+    if limit <= 0:
+        return 0
+    now = time.monotonic()
+    with _lock:
+        victims = [_pop(key) for key, entry in list(_entries.items()) if now - entry[2] > limit]
+    _evict(victims, "idle")
+    return len(victims)
+
+
+def usage() -> Dict[str, Any]:
+    with _lock:
+        kinds: Dict[str, Dict[str, int]] = {}
+        for kind, size, _, _ in _entries.values():
+            k = kinds.setdefault(kind, {"count": 0, "bytes": 0})
+            k["count"] += 1
+            k["bytes"] += size
+        return {"bytes": _total, "budget": budget_bytes(), "evictions": _evictions, "kinds": kinds}
+
+
+async def sweep_idle() -> None:
+    """Lifespan task: evict what nobody used for TABLE_IDLE_MINUTES."""
+    while True:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        evicted = await asyncio.to_thread(evict_idle)
+        if evicted:
+            u = usage()
+            logger.info("Table memory: %.1f / %.1f MB after evicting %s idle entries",
+                        u["bytes"] / 1024 ** 2, u["budget"] / 1024 ** 2, evicted)
+
+
+async def _usage(request: Request):
+    return JSONResponse(usage())
+
+
+routes: List[Route] = [
+    Route("/api/memory", _usage, methods=["GET"]),
+]
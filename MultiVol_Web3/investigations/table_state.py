@@ -1,13 +1,173 @@
 from __future__ import annotations
 
+import asyncio
 from pathlib import Path
-from typing import List, Dict, Any
-import json
+from typing import List, Dict, NamedTuple
+from array import array
 from urllib.parse import urlparse,parse_qs,urlunparse
 import reflex as rx
 # ---- ADDED ----
 import re
 from datetime import datetime
+from ..cases_management import tiering
+from . import datasets
+
+class RowQuery(NamedTuple):
+    """Filters and sort of a session, hashable: sessions asking the same share the result."""
+    search_value: str
+    column_filters: Dict[str, str]
+    sort_value: str
+    sort_reverse: bool
+    startswith_filters: Dict[str, str]
+    endswith_filters: Dict[str, str]
+    regex_filters: Dict[str, str]
+    emptiness_filters: Dict[str, str]
+    numeric_filters: List[Dict[str, str]]
+    date_filters: List[Dict[str, str]]
+
+    def key(self) -> tuple:
+        return tuple(
+            tuple(sorted(v.items())) if isinstance(v, dict)
+            else tuple(tuple(sorted(r.items())) for r in v) if isinstance(v, list)
+            else v
+            for v in self
+        )
+
+
+def select_rows(dataset: datasets.Dataset, q: RowQuery) -> array:
+    """Indices of the dataset rows `q` keeps, in display order."""
+    data = dataset.rows
+    cell = dataset.cell
+    rows = range(len(data))
+    if q.search_value:
+        needle = q.search_value.lower()
+        rows = [r for r in rows if any(needle in v.lower() for v in data[r])]
+    if q.column_filters:
+        def ok(row: int) -> bool:
+            for col, sub in q.column_filters.items():
+                if not sub:
+                    continue
+                if sub.lower() not in cell(data[row], col).lower():
+                    return False
+            return True
+        rows = [r for r in rows if ok(r)]
+    if q.sort_value:
+        rows = sorted(rows, key=lambda r: cell(data[r], q.sort_value))
+        if q.sort_reverse:
+            rows.reverse()
+    # Starts with
+    if q.startswith_filters:
+        def _ok_sw(row):
+            for c, v in q.startswith_filters.items():
+                if v and not cell(data[row], c).lower().startswith(v.lower()):
+                    return False
+            return True
+        rows = [r for r in rows if _ok_sw(r)]
+    # Ends with
+    if q.endswith_filters:
+        def _ok_ew(row):
+            for c, v in q.endswith_filters.items():
+                if v and not cell(data[row], c).lower().endswith(v.lower()):
+                    return False
+            return True
+        rows = [r for r in rows if _ok_ew(r)]
+    # Regex (case-insensitive)
+    if q.regex_filters:
+        compiled = {}
+        for c, pattern in q.regex_filters.items():
+            if pattern:
+                try:
+                    compiled[c] = re.compile(pattern, re.IGNORECASE)
+                except Exception:
+                    compiled[c] = None
+            else:
+                compiled[c] = None
+        def _ok_rx(row):
+            for c, rxp in compiled.items():
+                if rxp is None:
+                    return False
+                if not rxp.search(cell(data[row], c)):
+                    return False
+            return True
+        rows = [r for r in rows if _ok_rx(r)]
+    # Emptiness
+    if q.emptiness_filters:
+        def _ok_emp(row):
+            for c, mode in q.emptiness_filters.items():
+                val = cell(data[row], c)
+                empty = (val.strip() == "")
+                if mode == "empty" and not empty:
+                    return False
+                if mode == "nonempty" and empty:
+                    return False
+            return True
+        rows = [r for r in rows if _ok_emp(r)]
+    # Numeric comparisons
+    if q.numeric_filters:
+        def _try_float(s):
+            try:
+                return float(str(s).strip())
+            except Exception:
+                return None
+        def _ok_num(row):
+            for rec in q.numeric_filters:
+                col = rec.get("column", "")
+                op = rec.get("op", "==")
+                val = rec.get("value", "")
+                try:
+                    target = float(val)
+                except Exception:
+                    return False
+                x = _try_float(cell(data[row], col))
+                if x is None:
+                    return False
+                if op == "==":
+                    if not (x == target): return False
+                elif op == ">":
+                    if not (x > target): return False
+                elif op == ">=":
+                    if not (x >= target): return False
+                elif op == "<":
+                    if not (x < target): return False
+                elif op == "<=":
+                    if not (x <= target): return False
+                else:
+                    return False
+            return True
+        rows = [r for r in rows if _ok_num(r)]
+    # Date ranges
+    if q.date_filters:
+        def _to_dt(s: str):
+            s = str(s).strip()
+            if not s:
+                return None
+            try:
+                # handle Z
+                if s.endswith("Z"):
+                    s = s[:-1] + "+00:00"
+                return datetime.fromisoformat(s)
+            except Exception:
+                return None
+        def _ok_date(row):
+            for rec in q.date_filters:
+                col = rec.get("column", "")
+                start = rec.get("start", "").strip()
+                end = rec.get("end", "").strip()
+                v = _to_dt(cell(data[row], col))
+                if v is None:
+                    return False
+                if start:
+                    sdt = _to_dt(start)
+                    if sdt and v < sdt:
+                        return False
+                if end:
+                    edt = _to_dt(end)
+                    if edt and v > edt:
+                        return False
+            return True
+        rows = [r for r in rows if _ok_date(r)]
+    return array("I", rows)
+
 
 class TableState(rx.State):
     """JSON-driven table with dynamic columns, search, per-column filters,
@@ -15,7 +175,11 @@ class TableState(rx.State):
     """
 
     # ---------- raw data ----------
-    items: List[Dict[str, Any]] = []
+    # rows live once per process in datasets.py; a session only points at them
+    dataset_key: str = ""
+    dataset_version: str = ""
+    # bumped by reload_data: what the computed vars couldn't find is loaded now
+    data_tick: int = 0
 
     # ---------- ui state ----------
     search_value: str = ""
@@ -51,7 +215,7 @@ class TableState(rx.State):
     limit: int = 12
 
     # ---------- data loading ----------
-    def load_entries(self):
+    async def load_entries(self):
         current_url = self.router.url
         try:
             parsed_module = parse_qs(current_url.query)['module'][0]
@@ -64,31 +228,24 @@ class TableState(rx.State):
                 current_path = Path(__file__).parent.parent
                 cases_dir = current_path / "cases" / parsed_case / "volatility3_output"
                 # Try both Windows and Linux outputs
+                tiering.touch(cases_dir.parent)
                 for system in ("windows", "linux"):
                     candidate = cases_dir / f"{system}.{parsed_module}_output.json"
-                    if candidate.exists():
+                    # outputs of a cold case come back from its pack on first access
+                    # (off the event loop, like the read below: it can take a while)
+                    if candidate.exists() or await asyncio.to_thread(tiering.restore_output, candidate):
                         cases_path = candidate
                         break
                 path = cases_path
+                dataset = datasets.EMPTY
                 if path.exists():
-                    try:
-                        with path.open(encoding="utf-8") as f:
-                            data = json.load(f)
-                    except:
-                        data = json.loads(f'[{{"error": "Error while treating file", "filename": "{cases_path}"}}]')
-                    if isinstance(data, dict) and isinstance(data.get("data"), list):
-                        data = data["data"]
-                    if not isinstance(data, list):
-                        data = []
-                    self.items = [
-                        {k: "" if v is None else str(v) for k, v in row.items()}
-                        for row in data
-                        if isinstance(row, dict)
-                    ]
-                else:
-                    self.items = []
+                    dataset = await asyncio.to_thread(datasets.get, str(path))
+                self.dataset_key, self.dataset_version = dataset.key, dataset.version
+                if dataset.key:
+                    selection = datasets.selection(dataset.key, dataset.version, self._row_query(), select_rows)
+                    await asyncio.to_thread(selection.indices)
 
-                self.visible_columns = list(self.headers) if self.headers else []
+                self.visible_columns = list(dataset.headers)
                 self.offset = 0
         except Exception as e:
             # import os,sys
@@ -98,9 +255,14 @@ class TableState(rx.State):
             pass
 
     # ---------- derived vars ----------
+    # Computed vars never read or filter a dataset: that happens in reload_data, off the event
+    # loop. When what they need was evicted (memory.py), they show nothing and data_missing
+    # makes the page call reload_data.
     @rx.var(cache=True)
     def headers(self) -> List[str]:
-        return list(self.items[0].keys()) if self.items else []
+        self.data_tick  # recomputed after reload_data
+        dataset = datasets.peek(self.dataset_key, self.dataset_version)
+        return list(dataset.headers) if dataset is not None else []
 
     @rx.var(cache=True)
     def effective_headers(self) -> List[str]:
@@ -138,157 +300,68 @@ class TableState(rx.State):
             pass
         return self.col_width_default_px
 
-    @rx.var(cache=True)
-    def filtered_items(self) -> List[Dict[str, str]]:
-        rows = self.items
-        if self.search_value:
-            q = self.search_value.lower()
-            rows = [r for r in rows if any(q in str(v).lower() for v in r.values())]
-        if self.column_filters:
-            def ok(row: Dict[str, str]) -> bool:
-                for col, sub in self.column_filters.items():
-                    if not sub:
-                        continue
-                    if sub.lower() not in str(row.get(col, "")).lower():
-                        return False
-                return True
-            rows = [r for r in rows if ok(r)]
-        if self.sort_value:
-            rows = sorted(rows, key=lambda r: r.get(self.sort_value, ""))
-            if self.sort_reverse:
-                rows.reverse()
-        # Starts with
-        if self.startswith_filters:
-            def _ok_sw(row):
-                for c, v in self.startswith_filters.items():
-                    if v and not str(row.get(c, "")).lower().startswith(v.lower()):
-                        return False
-                return True
-            rows = [r for r in rows if _ok_sw(r)]
-        # Ends with
-        if self.endswith_filters:
-            def _ok_ew(row):
-                for c, v in self.endswith_filters.items():
-                    if v and not str(row.get(c, "")).lower().endswith(v.lower()):
-                        return False
-                return True
-            rows = [r for r in rows if _ok_ew(r)]
-        # Regex (case-insensitive)
-        if self.regex_filters:
-            compiled = {}
-            for c, pattern in self.regex_filters.items():
-                if pattern:
-                    try:
-                        compiled[c] = re.compile(pattern, re.IGNORECASE)
-                    except Exception:
-                        compiled[c] = None
-                else:
-                    compiled[c] = None
-            def _ok_rx(row):
-                for c, rxp in compiled.items():
-                    if rxp is None:
-                        return False
-                    if not rxp.search(str(row.get(c, ""))):
-                        return False
-                return True
-            rows = [r for r in rows if _ok_rx(r)]
-        # Emptiness
-        if self.emptiness_filters:
-            def _ok_emp(row):
-                for c, mode in self.emptiness_filters.items():
-                    val = str(row.get(c, ""))
-                    empty = (val.strip() == "")
-                    if mode == "empty" and not empty:
-                        return False
-                    if mode == "nonempty" and empty:
-                        return False
-                return True
-            rows = [r for r in rows if _ok_emp(r)]
-        # Numeric comparisons
-        if self.numeric_filters:
-            def _try_float(s):
-                try:
-                    return float(str(s).strip())
-                except Exception:
-                    return None
-            def _ok_num(row):
-                for rec in self.numeric_filters:
-                    col = rec.get("column", "")
-                    op = rec.get("op", "==")
-                    val = rec.get("value", "")
-                    try:
-                        target = float(val)
-                    except Exception:
-                        return False
-                    x = _try_float(row.get(col, ""))
-                    if x is None:
-                        return False
-                    if op == "==":
-                        if not (x == target): return False
-                    elif op == ">":
-                        if not (x > target): return False
-                    elif op == ">=":
-                        if not (x >= target): return False
-                    elif op == "<":
-                        if not (x < target): return False
-                    elif op == "<=":
-                        if not (x <= target): return False
-                    else:
-                        return False
-                return True
-            rows = [r for r in rows if _ok_num(r)]
-        # Date ranges
-        if self.date_filters:
-            def _to_dt(s: str):
-                s = str(s).strip()
-                if not s:
-                    return None
-                try:
-                    # handle Z
-                    if s.endswith("Z"):
-                        s = s[:-1] + "+00:00"
-                    return datetime.fromisoformat(s)
-                except Exception:
-                    return None
-            def _ok_date(row):
-                for rec in self.date_filters:
-                    col = rec.get("column", "")
-                    start = rec.get("start", "").strip()
-                    end = rec.get("end", "").strip()
-                    v = _to_dt(row.get(col, ""))
-                    if v is None:
-                        return False
-                    if start:
-                        sdt = _to_dt(start)
-                        if sdt and v < sdt:
-                            return False
-                    if end:
-                        edt = _to_dt(end)
-                        if edt and v > edt:
-                            return False
-                return True
-            rows = [r for r in rows if _ok_date(r)]
-        return rows
+    def _row_query(self) -> RowQuery:
+        return RowQuery(
+            self.search_value, self.column_filters, self.sort_value, self.sort_reverse,
+            self.startswith_filters, self.endswith_filters, self.regex_filters,
+            self.emptiness_filters, self.numeric_filters, self.date_filters,
+        )
+
+    @rx.var(cache=True, backend=True)
+    def _selection(self) -> datasets.Selection:
+        """This session's view of the shared dataset: the indices its filters and sort select
+        (computed once per distinct query, evictable, see memory.py)."""
+        return datasets.selection(self.dataset_key, self.dataset_version, self._row_query(), select_rows)
+
+    @rx.var
+    def data_missing(self) -> bool:
+        # not cached: an eviction changes nothing in the state
+        if not self.dataset_key:
+            return False
+        return datasets.peek(self.dataset_key, self.dataset_version) is None or self._selection.peek() is None
 
     @rx.var(cache=True)
-    def rows_matrix(self) -> List[List[str]]:
-        cols = self.effective_headers
-        return [[row.get(c, "") for c in cols] for row in self.filtered_items]
+    def row_count(self) -> int:
+        self.data_tick  # recomputed after reload_data
+        indices = self._selection.peek()
+        return len(indices) if indices is not None else 0
 
     @rx.var(cache=True)
     def page_number(self) -> int:
-        total = len(self.rows_matrix)
+        total = self.row_count
         return (self.offset // self.limit) + 1 if total else 1
 
     @rx.var(cache=True)
     def total_pages(self) -> int:
-        total = len(self.rows_matrix)
+        total = self.row_count
         return (total - 1) // self.limit + 1 if total else 1
 
     @rx.var(cache=True, initial_value=[])
     def current_page(self) -> List[List[str]]:
+        # only the rows of the page are materialized (and sent to the browser)
+        self.data_tick  # recomputed after reload_data
+        dataset = datasets.peek(self.dataset_key, self.dataset_version)
+        indices = self._selection.peek()
+        if dataset is None or indices is None:
+            return []
+        cols = self.effective_headers
         s, e = self.offset, self.offset + self.limit
-        return self.rows_matrix[s:e]
+        return [
+            [dataset.cell(dataset.rows[i], c) for c in cols]
+            for i in indices[s:e]
+            if i < len(dataset.rows)
+        ]
+
+    async def reload_data(self):
+        """Load / filter what the computed vars found missing, off the event loop."""
+        if not self.dataset_key:
+            return
+        dataset = await asyncio.to_thread(datasets.get, self.dataset_key, self.dataset_version)
+        # rewritten on disk meanwhile: follow the new version
+        self.dataset_key, self.dataset_version = dataset.key, dataset.version
+        selection = datasets.selection(self.dataset_key, self.dataset_version, self._row_query(), select_rows)
+        await asyncio.to_thread(selection.indices)
+        self.data_tick += 1
 
     # ---------- events: pagination ----------
     def first_page(self): self.offset = 0
@@ -3,6 +3,7 @@ from __future__ import annotations
 import reflex as rx
 from .templates.navbar import sidebar
 from .templates.spline_func import _spline_background
+from .uploads.stream import save_upload
 
 BG = "#0b0d0f"
 PANEL = "#121417"
@@ -25,12 +26,9 @@ class State(rx.State):
 
         saved_batch: list[str] = []
         for file in files:
-            data = await file.read()
-            path = root_profiles_path / file.name
-            with path.open("wb") as f:
-                f.write(data)
-            self.uploaded.append(file.name)
-            saved_batch.append(file.name)
+            path = await save_upload(file, root_profiles_path)
+            self.uploaded.append(path.name)
+            saved_batch.append(path.name)
 
         try:
             paths = [str(root_profiles_path / name) for name in saved_batch]
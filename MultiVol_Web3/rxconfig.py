@@ -7,6 +7,36 @@ config = rx.Config(
     app_name="MultiVol2",
     cli_multivol_path=os.getenv("CLI_MULTIVOL_PATH"),
     is_container=os.getenv("IS_CONTAINER"),
+    # analysis job queue
+    max_concurrent_jobs=os.getenv("MAX_CONCURRENT_JOBS", "2"),
+    job_max_attempts=os.getenv("JOB_MAX_ATTEMPTS", "3"),
+    # plugin runs (one vol3 process each) at once (0 = derive from CPU count and available RAM / RUN_RAM_GB)
+    max_parallel_runs=os.getenv("MAX_PARALLEL_RUNS", "0"),
+    run_ram_gb=os.getenv("RUN_RAM_GB", "4"),
+    # optional JSON file overriding the per-OS plugin priorities
+    plugin_priorities_file=os.getenv("PLUGIN_PRIORITIES_FILE"),
+    # part of the result cache key; defaults to the id of the local volatility3 docker image
+    volatility_version=os.getenv("VOLATILITY_VERSION"),
+    # host directory watched for dumps to import in place (SMB share, USB disk...); unset = disabled
+    drop_dir=os.getenv("DROP_DIR"),
+    # I/O threads reading cases when the case catalog is (re)built
+    scan_workers=os.getenv("SCAN_WORKERS", "16"),
+    # disk budget of cached case archives (least recently downloaded evicted first)
+    export_cache_gb=os.getenv("EXPORT_CACHE_GB", "20"),
+    # threads compressing case exports (0 = one per CPU)
+    export_threads=os.getenv("EXPORT_THREADS", "0"),
+    # MB per second freed when deleted cases are removed from disk (0 = unthrottled)
+    trash_rate_mb=os.getenv("TRASH_RATE_MB", "256"),
+    # zstd level finished module outputs are stored with (0 = stored as plain JSON)
+    compress_outputs=os.getenv("COMPRESS_OUTPUTS", "0"),
+    # days without access after which a case's outputs are packed into one archive (0 = never)
+    cold_after_days=os.getenv("COLD_AFTER_DAYS", "0"),
+    # memory /sheet may keep loaded tables and their row selections in, in MB (LRU eviction past it)
+    table_memory_mb=os.getenv("TABLE_MEMORY_MB", "2048"),
+    # loaded tables nobody used for this many minutes are evicted (0 = only on budget)
+    table_idle_minutes=os.getenv("TABLE_IDLE_MINUTES", "30"),
+    # disk budget of cached plugin outputs whose cases were deleted (least recently used evicted first)
+    result_cache_gb=os.getenv("RESULT_CACHE_GB", "20"),
     reflex_env_mode="prod",
     disable_plugins=['reflex.plugins.sitemap.SitemapPlugin']
 )
@@ -0,0 +1,39 @@
+# test_trash.py
+import os
+
+from MultiVol_Web3.cases_management import trash
+
+
+def _output(path, size):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = os.urandom(size)
+    path.write_bytes(data)
+    return data
+
+
+def test_delete_case_keeps_output_linked_to_result_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(trash, "TRUNCATE_STEP", 64 * 1024)
+    monkeypatch.setattr(trash, "rate_bytes", lambda: 0)
+    case = tmp_path / "cases" / "case1"
+    output = case / "volatility3_output" / "windows.pslist_output.json"
+    data = _output(output, 1024 * 1024)
+    entry = tmp_path / "cases" / ".result_cache" / "ab" / "ab.json"
+    entry.parent.mkdir(parents=True)
+    os.link(output, entry)
+
+    trash.remove_tree(case)
+
+    assert not case.exists()
+    assert entry.stat().st_nlink == 1
+    assert entry.read_bytes() == data
+
+
+def test_delete_case_removes_unlinked_big_output(tmp_path, monkeypatch):
+    monkeypatch.setattr(trash, "TRUNCATE_STEP", 64 * 1024)
+    monkeypatch.setattr(trash, "rate_bytes", lambda: 0)
+    case = tmp_path / "cases" / "case1"
+    _output(case / "volatility3_output" / "windows.pslist_output.json", 1024 * 1024)
+
+    trash.remove_tree(case)
+
+    assert not case.exists()
@@ -0,0 +1,381 @@
+# decompress.py
+# Incremental decompressors for compressed dump uploads (.gz, .xz, .zst, .lz4, single-file .zip).
+# Data is fed in upload order and comes out in bounded pieces, so a compressed image can be
+# expanded to disk (and hashed) while it streams in.
+from __future__ import annotations
+
+import abc
+import lzma
+import struct
+import zlib
+from pathlib import Path
+from typing import Iterator, Optional
+
+# upper bound of one decompressed piece, keeps memory flat on highly compressible images
+OUT_PIECE = 4 * 1024 * 1024
+# compressed input the zstd reader pulls at once
+_IN_PIECE = 64 * 1024
+
+
+class DecompressError(Exception):
+    pass
+
+
+class StreamDecompressor(abc.ABC):
+    suffix = ""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def output_name(self) -> str:
+        return self.name[: -len(self.suffix)] if self.name.lower().endswith(self.suffix) else self.name
+
+    @abc.abstractmethod
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        """Decompressed pieces for the next chunk of compressed input."""
+
+    def finish(self) -> Iterator[bytes]:
+        """Flush what is left; raises if the compressed stream is truncated."""
+        return iter(())
+
+
+class _GzipDecompressor(StreamDecompressor):
+    suffix = ".gz"
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+        self._started = False
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while data:
+            self._started = True
+            out = self._d.decompress(data, OUT_PIECE)
+            if out:
+                yield out
+            if self._d.eof:
+                # concatenated gzip members (pigz, `cat a.gz b.gz`)
+                data = self._d.unused_data
+                self._d = zlib.decompressobj(zlib.MAX_WBITS | 16)
+                self._started = bool(data)
+            else:
+                data = self._d.unconsumed_tail
+
+    def finish(self) -> Iterator[bytes]:
+        if self._started and not self._d.eof:
+            raise DecompressError("truncated gzip stream")
+        return iter(())
+
+
+class _XzDecompressor(StreamDecompressor):
+    suffix = ".xz"
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._d = lzma.LZMADecompressor()
+        self._started = False
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while True:
+            if self._d.eof:
+                data = self._d.unused_data + data
+                if not data:
+                    return
+                self._d = lzma.LZMADecompressor()
+            if not data and self._d.needs_input:
+                return
+            self._started = True
+            try:
+                out = self._d.decompress(data, OUT_PIECE)
+            except lzma.LZMAError as e:
+                raise DecompressError(str(e))
+            data = b""
+            if out:
+                yield out
+
+    def finish(self) -> Iterator[bytes]:
+        if self._started and not self._d.eof:
+            raise DecompressError("truncated xz stream")
+        return iter(())
+
+
+class _Starved(Exception):
+    """The zstd reader wants input past what was fed so far."""
+
+
+class _FedInput:
+    """Source of the zstd stream reader: the compressed bytes fed so far."""
+
+    def __init__(self) -> None:
+        self.buf = bytearray()
+        self.closed = False
+
+    def read(self, n: int = -1) -> bytes:
+        if not self.buf:
+            if self.closed:
+                return b""
+            # not EOF, just nothing yet: the reader gives up this read1() and resumes later
+            raise _Starved
+        n = len(self.buf) if n < 0 else n
+        data = bytes(self.buf[:n])
+        del self.buf[:n]
+        return data
+
+
+class _ZstdFrames:
+    """Follows frame boundaries from the headers only (the reader doesn't tell when the input
+    ends mid-frame)."""
+
+    def __init__(self) -> None:
+        self._pending = bytearray()
+        self._need = 4  # header bytes to collect before the next step
+        self._step = "magic"
+        self._skip = 0
+        self._checksum = False
+
+    @property
+    def in_frame(self) -> bool:
+        return self._step != "magic" or bool(self._pending) or bool(self._skip)
+
+    def feed(self, data: bytes) -> None:
+        pos = 0
+        while pos < len(data):
+            if self._skip:
+                n = min(self._skip, len(data) - pos)
+                self._skip -= n
+                pos += n
+                continue
+            take = min(self._need - len(self._pending), len(data) - pos)
+            self._pending += data[pos : pos + take]
+            pos += take
+            if len(self._pending) == self._need:
+                header = bytes(self._pending)
+                self._pending.clear()
+                self._next(header)
+
+    def _next(self, header: bytes) -> None:
+        if self._step == "magic":
+            magic = struct.unpack("<I", header)[0]
+            if magic == 0xFD2FB528:
+                self._step, self._need = "descriptor", 1
+            elif magic & 0xFFFFFFF0 == 0x184D2A50:
+                self._step, self._need = "skippable", 4
+            else:
+                raise DecompressError("not a zstd frame")
+        elif self._step == "skippable":
+            self._skip = struct.unpack("<I", header)[0]
+            self._step, self._need = "magic", 4
+        elif self._step == "descriptor":
+            d = header[0]
+            single = bool(d & 0x20)
+            self._checksum = bool(d & 0x04)
+            fcs = (1 if single else 0, 2, 4, 8)[d >> 6]
+            self._skip = (0 if single else 1) + (0, 1, 2, 4)[d & 0x03] + fcs
+            self._step, self._need = "block", 3
+        elif self._step == "block":
+            value = int.from_bytes(header, "little")
+            kind, size = (value >> 1) & 0x03, value >> 3
+            if kind == 3:
+                raise DecompressError("corrupted zstd block")
+            self._skip = 1 if kind == 1 else size
+            if value & 1:
+                if self._checksum:
+                    self._skip += 4
+                self._step, self._need = "magic", 4
+
+
+class _ZstdDecompressor(StreamDecompressor):
+    suffix = ".zst"
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        try:
+            import zstandard
+        except ImportError:
+            raise DecompressError("zstandard is not installed, .zst uploads are not supported")
+        self._zstd = zstandard
+        # pull mode: read1() returns at most OUT_PIECE, the decompressobj API has no bound
+        self._input = _FedInput()
+        self._reader = zstandard.ZstdDecompressor().stream_reader(
+            self._input, read_size=_IN_PIECE, read_across_frames=True
+        )
+        self._frames = _ZstdFrames()
+
+    def _drain(self) -> Iterator[bytes]:
+        while True:
+            try:
+                out = self._reader.read1(OUT_PIECE)
+            except _Starved:
+                return
+            except self._zstd.ZstdError as e:
+                raise DecompressError(str(e))
+            if not out:
+                return
+            yield out
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        self._frames.feed(data)
+        self._input.buf += data
+        yield from self._drain()
+
+    def finish(self) -> Iterator[bytes]:
+        self._input.closed = True
+        yield from self._drain()
+        if self._frames.in_frame:
+            raise DecompressError("truncated zstd stream")
+
+
+class _Lz4Decompressor(StreamDecompressor):
+    suffix = ".lz4"
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        try:
+            import lz4.frame
+        except ImportError:
+            raise DecompressError("lz4 is not installed, .lz4 uploads are not supported")
+        self._frame = lz4.frame
+        self._d = lz4.frame.LZ4FrameDecompressor()
+        self._started = False
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        while True:
+            if self._d.eof:
+                data = (self._d.unused_data or b"") + data
+                if not data:
+                    return
+                self._d = self._frame.LZ4FrameDecompressor()
+            if not data and self._d.needs_input:
+                return
+            self._started = True
+            try:
+                out = self._d.decompress(data, max_length=OUT_PIECE)
+            except RuntimeError as e:
+                raise DecompressError(str(e))
+            data = b""
+            if out:
+                yield out
+
+    def finish(self) -> Iterator[bytes]:
+        if self._started and not self._d.eof:
+            raise DecompressError("truncated lz4 stream")
+        return iter(())
+
+
+class _ZipDecompressor(StreamDecompressor):
+    """Reads a zip front to back from its local header, so only one member is allowed."""
+
+    suffix = ".zip"
+    _LOCAL = b"PK\x03\x04"
+    _CENTRAL = (b"PK\x01\x02", b"PK\x05\x06", b"PK\x07\x08", b"PK\x06\x06")
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self._buf = b""
+        self._member: Optional[str] = None
+        self._method = -1
+        self._remaining: Optional[int] = None  # stored members only
+        self._inflate = None
+        self._done = False
+
+    def output_name(self) -> str:
+        if self._member is None:
+            return super().output_name()
+        return Path(self._member.replace("\\", "/")).name or super().output_name()
+
+    def _parse_header(self) -> bool:
+        if len(self._buf) < 30:
+            return False
+        if self._buf[:4] != self._LOCAL:
+            raise DecompressError("not a zip file")
+        (_, _, flags, method, _, _, _, csize, _, name_len, extra_len) = struct.unpack("<4sHHHHHIIIHH", self._buf[:30])
+        end = 30 + name_len + extra_len
+        if len(self._buf) < end:
+            return False
+        if flags & 0x1:
+            raise DecompressError("encrypted zip files are not supported")
+        name = self._buf[30 : 30 + name_len].decode("utf-8" if flags & 0x800 else "cp437")
+        if name.endswith("/"):
+            raise DecompressError("the zip must contain a single file, not a directory")
+        if csize == 0xFFFFFFFF:
+            extra = self._buf[30 + name_len : end]
+            while len(extra) >= 4:
+                tag, size = struct.unpack("<HH", extra[:4])
+                if tag == 0x0001 and size >= 16:
+                    csize = struct.unpack("<Q", extra[12:20])[0]
+                extra = extra[4 + size :]
+        if method == 8:
+            self._inflate = zlib.decompressobj(-zlib.MAX_WBITS)
+        elif method == 0:
+            if flags & 0x8:
+                raise DecompressError("stored zip members with a data descriptor are not supported")
+            self._remaining = csize
+        else:
+            raise DecompressError(f"zip compression method {method} is not supported (use deflate)")
+        self._member, self._method = name, method
+        self._buf = self._buf[end:]
+        return True
+
+    def feed(self, data: bytes) -> Iterator[bytes]:
+        self._buf += data
+        if self._member is None and not self._parse_header():
+            return
+        if self._done:
+            self._check_trailer()
+            return
+        if self._method == 0:
+            take = self._buf[: self._remaining]
+            self._buf = self._buf[len(take) :]
+            self._remaining -= len(take)
+            for i in range(0, len(take), OUT_PIECE):
+                yield take[i : i + OUT_PIECE]
+            if self._remaining == 0:
+                self._done = True
+        else:
+            data, self._buf = self._buf, b""
+            while data:
+                out = self._inflate.decompress(data, OUT_PIECE)
+                if out:
+                    yield out
+                if self._inflate.eof:
+                    self._buf = self._inflate.unused_data
+                    self._done = True
+                    break
+                data = self._inflate.unconsumed_tail
+        if self._done:
+            self._check_trailer()
+
+    def _check_trailer(self) -> None:
+        # after the member: optional data descriptor, then the central directory
+        buf = self._buf
+        if buf[:4] == b"PK\x07\x08":
+            buf = buf[16:]
+        if len(buf) >= 4:
+            if buf[:4] == self._LOCAL:
+                raise DecompressError("the zip contains more than one file")
+            if buf[:4] not in self._CENTRAL and self._buf[:4] != b"PK\x07\x08":
+                # descriptor without signature (12 or 20 bytes) then central directory
+                if self._LOCAL in buf[:32]:
+                    raise DecompressError("the zip contains more than one file")
+        # keep memory bounded, the trailer content itself is not needed
+        self._buf = self._buf[:64]
+
+    def finish(self) -> Iterator[bytes]:
+        if not self._done:
+            raise DecompressError("truncated zip file")
+        return iter(())
+
+
+_BY_SUFFIX = {
+    ".gz": _GzipDecompressor,
+    ".xz": _XzDecompressor,
+    ".zst": _ZstdDecompressor,
+    ".lz4": _Lz4Decompressor,
+    ".zip": _ZipDecompressor,
+}
+
+
+def for_name(name: str) -> Optional[StreamDecompressor]:
+    """Decompressor for an upload named `name`, None for raw dumps."""
+    cls = _BY_SUFFIX.get(Path(name).suffix.lower())
+    return cls(name) if cls else None
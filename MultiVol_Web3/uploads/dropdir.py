@@ -0,0 +1,174 @@
+# dropdir.py
+# Server-side import of dumps that already sit on the analysis host (SMB share, USB disk...).
+# DROP_DIR is watched; every image that lands there is registered in the dump index by path
+# (store.register_path, nothing is copied) and hashed in the background so the result cache
+# and dedup work for it too. Cases are created from these names like from uploaded dumps.
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from watchfiles import Change, awatch
+
+from ..rxconfig import config
+from . import decompress, store
+
+logger = logging.getLogger(__name__)
+
+# a dump is registered once its size hasn't moved for this long (copies still in progress)
+SETTLE_SECONDS = 5.0
+HASH_CHUNK = 8 * 1024 * 1024
+# temp names of copy tools / browsers, never a finished image
+_SKIPPED_SUFFIXES = (".part", ".partial", ".tmp", ".crdownload", ".filepart", ".json")
+
+_hash_queue: Optional[asyncio.Queue] = None
+
+
+def drop_dir() -> Optional[Path]:
+    configured = getattr(config, "drop_dir", None)
+    return Path(configured).resolve() if configured else None
+
+
+def is_candidate(path: Path) -> bool:
+    name = path.name
+    if name.startswith(".") or name.startswith("~") or name.lower().endswith(_SKIPPED_SUFFIXES):
+        return False
+    return path.is_file()
+
+
+def _candidate_size(path: Path) -> Optional[int]:
+    """Size of a candidate image, None for anything else (or gone)."""
+    try:
+        return path.stat().st_size if is_candidate(path) else None
+    except FileNotFoundError:
+        return None
+
+
+def _scan(root: Path) -> List[Path]:
+    return [path for path in sorted(root.rglob("*")) if is_candidate(path)]
+
+
+def list_imports() -> List[Dict[str, str]]:
+    """Dumps registered from the drop directory, for the upload page."""
+    rows = []
+    for name, record in sorted(store.registered_paths().items()):
+        rows.append({
+            "name": name,
+            "path": record["path"],
+            "size": f"{record.get('size', 0) / 1024 ** 3:.2f} GB",
+            "sha256": record.get("sha256") or "",
+        })
+    return rows
+
+
+def _hash_file(path: Path) -> Tuple[str, int, float]:
+    st = path.stat()
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while True:
+            data = f.read(HASH_CHUNK)
+            if not data:
+                break
+            digest.update(data)
+    return digest.hexdigest(), st.st_size, st.st_mtime
+
+
+async def _hash_worker(queue: asyncio.Queue) -> None:
+    # one at a time: these are multi-GB sequential reads, often over the network
+    while True:
+        name, path = await queue.get()
+        try:
+            sha256, size, mtime = await asyncio.to_thread(_hash_file, path)
+            if await asyncio.to_thread(store.set_sha256, name, path, sha256, size, mtime):
+                logger.info("Hashed imported dump %s (sha256 %s)", name, sha256)
+        except FileNotFoundError:
+            pass
+        except Exception:
+            logger.exception("Could not hash imported dump %s", path)
+        finally:
+            queue.task_done()
+
+
+async def _register(path: Path) -> None:
+    if decompress.for_name(path.name) is not None:
+        logger.warning("%s is compressed, upload it through the page to have it decompressed", path)
+        return
+    try:
+        name = await asyncio.to_thread(store.register_path, path, path.name)
+    except (OSError, ValueError):
+        logger.exception("Could not import %s", path)
+        return
+    record = await asyncio.to_thread(store.lookup_name, name) or {}
+    if not record.get("sha256") and _hash_queue is not None:
+        _hash_queue.put_nowait((name, path))
+    logger.info("Imported %s from the drop directory as %s", path, name)
+
+
+def _forget_missing(root: Path) -> None:
+    for record in store.registered_paths().values():
+        path = Path(record["path"])
+        if path.is_relative_to(root) and not path.exists():
+            store.unregister_path(path)
+
+
+async def watch_drop_dir() -> None:
+    """Lifespan task: register images dropped into DROP_DIR (no-op when it isn't set)."""
+    global _hash_queue
+    root = drop_dir()
+    if root is None:
+        return
+    if not root.is_dir():
+        logger.warning("DROP_DIR %s is not a directory, server-side import is disabled", root)
+        return
+    _hash_queue = asyncio.Queue()
+    hasher = asyncio.create_task(_hash_worker(_hash_queue))
+
+    # path -> (size seen, monotonic time it was last seen changing)
+    pending: Dict[Path, Tuple[int, float]] = {}
+    wake = asyncio.Event()
+
+    async def _settle() -> None:
+        while True:
+            if not pending:
+                wake.clear()
+                await wake.wait()
+            await asyncio.sleep(SETTLE_SECONDS / 2)
+            now = time.monotonic()
+            for path, (size, since) in list(pending.items()):
+                current = await asyncio.to_thread(_candidate_size, path)
+                if current is None:
+                    pending.pop(path, None)
+                    continue
+                if current != size:
+                    pending[path] = (current, now)
+                elif now - since >= SETTLE_SECONDS:
+                    pending.pop(path, None)
+                    await _register(path)
+
+    # what was dropped while the server was down (DROP_DIR is often remote: every stat off the loop)
+    await asyncio.to_thread(_forget_missing, root)
+    for path in await asyncio.to_thread(_scan, root):
+        await _register(path)
+
+    settler = asyncio.create_task(_settle())
+    try:
+        async for changes in awatch(root, recursive=True):
+            now = time.monotonic()
+            for change, raw in changes:
+                path = Path(raw)
+                if change == Change.deleted:
+                    for name in await asyncio.to_thread(store.unregister_path, path):
+                        logger.info("%s left the drop directory, %s unregistered", path, name)
+                    pending.pop(path, None)
+                    continue
+                size = await asyncio.to_thread(_candidate_size, path)
+                if size is not None:
+                    pending[path] = (size, now)
+            wake.set()
+    finally:
+        settler.cancel()
+        hasher.cancel()
@@ -0,0 +1,334 @@
+# resumable.py
+# Resumable dump uploads over plain HTTP: the browser PUTs fixed-size chunks (several in parallel)
+# at their offset into a server-side partial file, each with its SHA-256. A status query tells
+# an interrupted client which chunks are still missing.
+#
+#   POST /api/uploads                   create (or find) a session  {name, size, last_modified}
+#   GET  /api/uploads/{id}              status: received chunk indexes
+#   PUT  /api/uploads/{id}?offset=N     one chunk, header X-Chunk-Sha256
+#   POST /api/uploads/{id}/complete     move the finished file into uploaded_files
+#
+# The whole-file SHA-256 is computed while the upload streams in: each time the chunk at the
+# hash frontier lands, the contiguous received range is fed to the hasher (still in the page
+# cache), so completing a 32 GB upload doesn't re-read it. Completed files go to the content
+# store (store.py), which drops the copy when the same dump is already stored.
+#
+# Compressed dumps (.gz/.xz/.zst/.lz4/single-file .zip, see decompress.py) are expanded at the
+# same frontier into <id>.out, and the hash is the one of the decompressed image, so the
+# network only carries the compressed bytes and nothing is read twice.
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+import reflex as rx
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+from . import decompress, store
+from .stream import PARTIAL_DIR, safe_name
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 16 * 1024 * 1024
+# buffer this much of a chunk body before each positional write
+_WRITE_BUFFER = 1024 * 1024
+
+_locks: Dict[str, asyncio.Lock] = {}
+# upload id -> (running sha256, bytes fed so far, decompressor); rebuilt from disk after a restart
+_hashers: Dict[str, Tuple[Any, int, Optional[decompress.StreamDecompressor]]] = {}
+
+
+class UploadError(Exception):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def _partial_dir() -> Path:
+    path = rx.get_upload_dir() / PARTIAL_DIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _meta_path(upload_id: str) -> Path:
+    if not upload_id.isalnum():
+        raise UploadError("unknown upload", 404)
+    return _partial_dir() / f"{upload_id}.json"
+
+
+def _part_path(upload_id: str) -> Path:
+    return _partial_dir() / f"{upload_id}.part"
+
+
+def _out_path(upload_id: str) -> Path:
+    return _partial_dir() / f"{upload_id}.out"
+
+
+def _lock(upload_id: str) -> asyncio.Lock:
+    return _locks.setdefault(upload_id, asyncio.Lock())
+
+
+def _load(upload_id: str) -> Dict[str, Any]:
+    try:
+        with _meta_path(upload_id).open("r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        raise UploadError("unknown upload", 404)
+
+
+def _save(meta: Dict[str, Any]) -> None:
+    path = _meta_path(meta["id"])
+    tmp = path.with_suffix(".json.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    os.replace(tmp, path)
+
+
+def _chunk_count(meta: Dict[str, Any]) -> int:
+    return -(-meta["size"] // meta["chunk_size"])
+
+
+def status(upload_id: str) -> Dict[str, Any]:
+    meta = _load(upload_id)
+    received = sorted(int(i) for i in meta["chunks"])
+    return {
+        "id": meta["id"],
+        "name": meta["name"],
+        "size": meta["size"],
+        "chunk_size": meta["chunk_size"],
+        "chunks": _chunk_count(meta),
+        "received": received,
+        "received_bytes": sum(min(meta["chunk_size"], meta["size"] - i * meta["chunk_size"]) for i in received),
+    }
+
+
+def open_session(
+    name: str,
+    size: int,
+    last_modified: Any = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> Dict[str, Any]:
+    """Create an upload session, or return the unfinished one for the same file so it resumes."""
+    name = safe_name(name)
+    if size < 0:
+        raise UploadError("invalid size")
+    try:
+        compressed = decompress.for_name(name) is not None
+    except decompress.DecompressError as e:
+        raise UploadError(str(e), 415)
+    key = hashlib.sha256(f"{name}\0{size}\0{last_modified}".encode()).hexdigest()
+    for meta_file in _partial_dir().glob("*.json"):
+        try:
+            with meta_file.open("r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if meta.get("key") == key and _part_path(meta["id"]).exists():
+            return status(meta["id"])
+
+    upload_id = uuid4().hex
+    with _part_path(upload_id).open("wb") as f:
+        f.truncate(size)
+    _save({
+        "id": upload_id,
+        "key": key,
+        "name": name,
+        "size": size,
+        "chunk_size": chunk_size,
+        "chunks": {},
+        "compressed": compressed,
+        "created": time.time(),
+    })
+    logger.info("Opened upload %s for %s (%s bytes)", upload_id, name, size)
+    return status(upload_id)
+
+
+async def write_chunk(upload_id: str, offset: int, body, expected_sha256: str = "") -> Dict[str, Any]:
+    """Write one chunk read from the async iterator `body` at `offset`, verifying its hash."""
+    meta = _load(upload_id)
+    chunk_size, size = meta["chunk_size"], meta["size"]
+    if offset < 0 or offset % chunk_size or offset >= max(size, 1):
+        raise UploadError("offset is not a chunk boundary")
+    index = offset // chunk_size
+    expected_len = min(chunk_size, size - offset)
+
+    digest = hashlib.sha256()
+    written = 0
+    pending = bytearray()
+    fd = os.open(_part_path(upload_id), os.O_WRONLY)
+    try:
+        async for data in body:
+            if written + len(pending) + len(data) > expected_len:
+                raise UploadError("chunk is larger than expected")
+            digest.update(data)
+            pending += data
+            if len(pending) >= _WRITE_BUFFER:
+                await asyncio.to_thread(os.pwrite, fd, bytes(pending), offset + written)
+                written += len(pending)
+                pending.clear()
+        if pending:
+            await asyncio.to_thread(os.pwrite, fd, bytes(pending), offset + written)
+            written += len(pending)
+    finally:
+        os.close(fd)
+
+    if written != expected_len:
+        raise UploadError(f"chunk {index} is {written} bytes, expected {expected_len}")
+    sha = digest.hexdigest()
+    if expected_sha256 and expected_sha256.lower() != sha:
+        raise UploadError(f"chunk {index} checksum mismatch", 422)
+
+    async with _lock(upload_id):
+        meta = _load(upload_id)
+        meta["chunks"][str(index)] = sha
+        _save(meta)
+        await asyncio.to_thread(_advance_hash, meta)
+    return {"index": index, "sha256": sha}
+
+
+def _advance_hash(meta: Dict[str, Any]) -> int:
+    """Feed every contiguous received chunk past the hash frontier to the file hasher.
+
+    For compressed uploads the data goes through the decompressor first and its output is
+    appended to <id>.out; decompressor state can't be persisted, so after a restart the
+    received prefix is decompressed again from the start.
+    """
+    upload_id, chunk_size, size = meta["id"], meta["chunk_size"], meta["size"]
+    state = _hashers.get(upload_id)
+    if state is None:
+        state = (hashlib.sha256(), 0, decompress.for_name(meta["name"]) if meta.get("compressed") else None)
+        if state[2] is not None:
+            _out_path(upload_id).open("wb").close()
+    hasher, pos, decompressor = state
+    out = _out_path(upload_id).open("ab") if decompressor is not None else None
+    try:
+        with _part_path(upload_id).open("rb") as f:
+            f.seek(pos)
+            while pos < size and str(pos // chunk_size) in meta["chunks"]:
+                remaining = min(chunk_size, size - pos)
+                while remaining:
+                    data = f.read(min(remaining, _WRITE_BUFFER))
+                    if not data:
+                        raise UploadError("partial file is shorter than expected", 500)
+                    if out is None:
+                        hasher.update(data)
+                    else:
+                        for piece in decompressor.feed(data):
+                            hasher.update(piece)
+                            out.write(piece)
+                    remaining -= len(data)
+                    pos += len(data)
+    except decompress.DecompressError as e:
+        _hashers.pop(upload_id, None)
+        raise UploadError(f"{meta['name']}: {e}", 422)
+    finally:
+        if out is not None:
+            out.close()
+    _hashers[upload_id] = (hasher, pos, decompressor)
+    return pos
+
+
+def _finish_output(upload_id: str) -> Tuple[Path, str]:
+    """Flush the decompressor of a compressed upload; returns the image path and its name."""
+    hasher, _, decompressor = _hashers[upload_id]
+    try:
+        with _out_path(upload_id).open("ab") as out:
+            for piece in decompressor.finish():
+                hasher.update(piece)
+                out.write(piece)
+    except decompress.DecompressError as e:
+        _hashers.pop(upload_id, None)
+        raise UploadError(f"{decompressor.name}: {e}", 422)
+    return _out_path(upload_id), decompressor.output_name()
+
+
+async def complete(upload_id: str) -> store.StoredDump:
+    """All chunks are in: fsync and hand the file over to the content store."""
+    async with _lock(upload_id):
+        meta = _load(upload_id)
+        missing = [i for i in range(_chunk_count(meta)) if str(i) not in meta["chunks"]]
+        if missing:
+            raise UploadError(f"{len(missing)} chunk(s) missing", 409)
+        if await asyncio.to_thread(_advance_hash, meta) != meta["size"]:
+            raise UploadError("file hash is incomplete", 500)
+        part, name = _part_path(upload_id), meta["name"]
+        if meta.get("compressed"):
+            part, name = await asyncio.to_thread(_finish_output, upload_id)
+        fd = os.open(part, os.O_RDONLY)
+        try:
+            await asyncio.to_thread(os.fsync, fd)
+        finally:
+            os.close(fd)
+        sha256 = _hashers[upload_id][0].hexdigest()
+        stored = await asyncio.to_thread(store.commit, part, name, sha256)
+        _part_path(upload_id).unlink(missing_ok=True)
+        _meta_path(upload_id).unlink(missing_ok=True)
+    _locks.pop(upload_id, None)
+    _hashers.pop(upload_id, None)
+    logger.info("Upload %s completed as %s (sha256 %s)", upload_id, stored.path, sha256)
+    return stored
+
+
+# ---------------- HTTP ----------------
+
+def _error(e: Exception) -> JSONResponse:
+    code = e.status if isinstance(e, UploadError) else 400
+    return JSONResponse({"error": str(e)}, status_code=code)
+
+
+async def _create(request: Request) -> JSONResponse:
+    try:
+        body = await request.json()
+        return JSONResponse(open_session(
+            str(body["name"]),
+            int(body["size"]),
+            body.get("last_modified"),
+        ))
+    except (UploadError, KeyError, ValueError, TypeError) as e:
+        return _error(e)
+
+
+async def _status(request: Request) -> JSONResponse:
+    try:
+        return JSONResponse(status(request.path_params["upload_id"]))
+    except UploadError as e:
+        return _error(e)
+
+
+async def _put(request: Request) -> JSONResponse:
+    try:
+        offset = int(request.query_params.get("offset", ""))
+        result = await write_chunk(
+            request.path_params["upload_id"],
+            offset,
+            request.stream(),
+            request.headers.get("x-chunk-sha256", ""),
+        )
+        return JSONResponse(result)
+    except (UploadError, ValueError) as e:
+        return _error(e)
+
+
+async def _complete(request: Request) -> JSONResponse:
+    try:
+        stored = await complete(request.path_params["upload_id"])
+        return JSONResponse({"name": stored.path.name, "sha256": stored.sha256, "deduplicated": stored.deduplicated})
+    except UploadError as e:
+        return _error(e)
+
+
+routes: List[Route] = [
+    Route("/api/uploads", _create, methods=["POST"]),
+    Route("/api/uploads/{upload_id}", _status, methods=["GET"]),
+    Route("/api/uploads/{upload_id}", _put, methods=["PUT"]),
+    Route("/api/uploads/{upload_id}/complete", _complete, methods=["POST"]),
+]
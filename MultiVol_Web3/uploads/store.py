@@ -0,0 +1,175 @@
+# store.py
+# Content-addressed storage for dumps: every upload is kept once under its SHA-256 in
+# uploaded_files/.blobs, and uploaded_files/<name> is a hard link to the blob (so the CLI
+# paths don't change). uploaded_files/.index.json maps names to hashes.
+# Dumps imported from the drop directory (dropdir.py) are only registered: their index record
+# carries the `path` they are read from, and `sha256` stays empty until they are hashed.
+from __future__ import annotations
+
+import json
+import logging
+import os
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+import reflex as rx
+
+from .stream import _fsync_dir, safe_name
+
+logger = logging.getLogger(__name__)
+
+BLOBS_DIR = ".blobs"
+INDEX_NAME = ".index.json"
+
+_index_lock = threading.Lock()
+_SHA256 = re.compile(r"[0-9a-f]{64}")
+
+
+@dataclass
+class StoredDump:
+    path: Path
+    sha256: str
+    size: int
+    deduplicated: bool
+
+
+def _blob_path(sha256: str) -> Path:
+    # the hash becomes a path: anything but a lowercase hex digest is refused
+    if not _SHA256.fullmatch(sha256):
+        raise ValueError(f"invalid sha256: {sha256!r}")
+    return rx.get_upload_dir() / BLOBS_DIR / sha256[:2] / sha256
+
+
+def _read_index() -> Dict[str, Dict[str, Any]]:
+    try:
+        with (rx.get_upload_dir() / INDEX_NAME).open("r", encoding="utf-8") as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_index(index: Dict[str, Dict[str, Any]]) -> None:
+    path = rx.get_upload_dir() / INDEX_NAME
+    tmp = path.with_suffix(f".{uuid4().hex}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(index, f, indent=4)
+    os.replace(tmp, path)
+
+
+def lookup_name(name: str) -> Optional[Dict[str, Any]]:
+    """Index record ({sha256, size, added[, path]}) of an uploaded dump name."""
+    return _read_index().get(Path(name).name)
+
+
+def source_path(name: str) -> Optional[Path]:
+    """Where a registered-by-path dump lives, None for dumps stored in uploaded_files."""
+    record = lookup_name(name)
+    return Path(record["path"]) if record and record.get("path") else None
+
+
+def register_path(path: Path, name: str) -> str:
+    """Register the file at `path` under a free dump name without copying it; returns the name.
+
+    The same path keeps its name (and is reset to unhashed when its size or mtime changed).
+    """
+    st = path.stat()
+    base = safe_name(name)
+    with _index_lock:
+        index = _read_index()
+        final, n = base, 1
+        while final in index or (rx.get_upload_dir() / final).exists():
+            if index.get(final, {}).get("path") == str(path):
+                break
+            n += 1
+            final = f"{Path(base).stem}-{n}{Path(base).suffix}"
+        previous = index.get(final, {})
+        unchanged = previous.get("size") == st.st_size and previous.get("mtime") == st.st_mtime
+        index[final] = {
+            "sha256": previous.get("sha256", "") if unchanged else "",
+            "size": st.st_size,
+            "mtime": st.st_mtime,
+            "added": previous.get("added", time.time()),
+            "path": str(path),
+        }
+        _write_index(index)
+    return final
+
+
+def set_sha256(name: str, path: Path, sha256: str, size: int, mtime: float) -> bool:
+    """Record the hash of a registered-by-path dump, unless the file changed while it was read."""
+    with _index_lock:
+        index = _read_index()
+        record = index.get(name)
+        if not record or record.get("path") != str(path) or record.get("size") != size or record.get("mtime") != mtime:
+            return False
+        record["sha256"] = sha256
+        _write_index(index)
+    return True
+
+
+def unregister_path(path: Path) -> List[str]:
+    """Forget every name registered for `path` (the file left the drop directory)."""
+    with _index_lock:
+        index = _read_index()
+        names = [n for n, r in index.items() if r.get("path") == str(path)]
+        for n in names:
+            del index[n]
+        if names:
+            _write_index(index)
+    return names
+
+
+def registered_paths() -> Dict[str, Dict[str, Any]]:
+    """name -> index record of every dump registered by path."""
+    return {n: r for n, r in _read_index().items() if r.get("path")}
+
+
+def has_blob(sha256: str) -> bool:
+    return _blob_path(sha256).exists()
+
+
+def _link_name(blob: Path, name: str) -> Path:
+    """Atomically point uploaded_files/<name> at `blob`."""
+    final = rx.get_upload_dir() / safe_name(name)
+    tmp = final.with_name(f".{final.name}.{uuid4().hex}.link")
+    os.link(blob, tmp)
+    os.replace(tmp, final)
+    return final
+
+
+def _register(name: str, sha256: str, size: int) -> Path:
+    final = _link_name(_blob_path(sha256), name)
+    with _index_lock:
+        index = _read_index()
+        index[final.name] = {"sha256": sha256, "size": size, "added": time.time()}
+        _write_index(index)
+    return final
+
+
+def commit(tmp: Path, name: str, sha256: str) -> StoredDump:
+    """Move a fully written (and fsynced) temp file into the store under `name`.
+
+    When a blob with the same hash already exists the temp file is dropped and the name is
+    linked to the existing blob instead.
+    """
+    size = tmp.stat().st_size
+    blob = _blob_path(sha256)
+    # same hash but another size: the stored blob is damaged, the new file replaces it
+    deduplicated = blob.exists() and blob.stat().st_size == size
+    if deduplicated:
+        tmp.unlink(missing_ok=True)
+    else:
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, blob)
+        _fsync_dir(blob.parent)
+    final = _register(name, sha256, size)
+    if deduplicated:
+        logger.info("%s is identical to an existing dump (%s), reusing it", final.name, sha256)
+    return StoredDump(final, sha256, size, deduplicated)
+
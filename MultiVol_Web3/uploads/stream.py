@@ -0,0 +1,73 @@
+# stream.py
+# Write uploads to disk chunk by chunk: memory stays bounded by CHUNK_SIZE whatever the dump size,
+# and the final name only appears once the data is complete (fsync + atomic rename).
+from __future__ import annotations
+
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator
+from uuid import uuid4
+
+import reflex as rx
+
+CHUNK_SIZE = 8 * 1024 * 1024
+PARTIAL_DIR = ".partial"
+
+
+def safe_name(name: str) -> str:
+    """Client file names are only trusted as a base name."""
+    base = Path(str(name).replace("\\", "/")).name
+    if base in ("", ".", ".."):
+        raise ValueError(f"invalid file name: {name!r}")
+    return base
+
+
+def _fsync_dir(path: Path) -> None:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+async def iter_upload(file: rx.UploadFile, chunk_size: int = CHUNK_SIZE) -> AsyncIterator[bytes]:
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        yield chunk
+
+
+async def save_stream(chunks: AsyncIterator[bytes], dest_dir: Path, name: str) -> Path:
+    """Stream `chunks` into `dest_dir/name`.
+
+    Data goes to `dest_dir/.partial/<random>.part` first; it is fsynced and renamed over the
+    final name only when the stream is exhausted, so a half-written dump is never picked up.
+    """
+    final = dest_dir / safe_name(name)
+    partial_dir = dest_dir / PARTIAL_DIR
+    partial_dir.mkdir(parents=True, exist_ok=True)
+    tmp = partial_dir / f"{uuid4().hex}.part"
+    try:
+        with tmp.open("wb") as f:
+            async for chunk in chunks:
+                # disk writes off the event loop, one bounded chunk at a time
+                await asyncio.to_thread(f.write, chunk)
+            await asyncio.to_thread(f.flush)
+            await asyncio.to_thread(os.fsync, f.fileno())
+        os.replace(tmp, final)
+        _fsync_dir(dest_dir)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return final
+
+
+async def save_upload(file: rx.UploadFile, dest_dir: Path) -> Path:
+    return await save_stream(iter_upload(file), dest_dir, file.name)
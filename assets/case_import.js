@@ -0,0 +1,22 @@
+// Case import: the picked archive is POSTed as the raw request body (see
+// MultiVol_Web3/cases_management/case_import.py); the browser streams it from disk.
+(function () {
+  window.multivolImportCase = async function (apiUrl, inputId) {
+    const input = document.getElementById(inputId);
+    const file = input && input.files && input.files[0];
+    if (!file) return { ok: false, error: "no archive selected", case: "" };
+    try {
+      const resp = await fetch(`${apiUrl}/api/cases/import?filename=${encodeURIComponent(file.name)}`, {
+        method: "POST",
+        headers: { "Content-Type": "application/octet-stream" },
+        body: file,
+      });
+      const result = await resp.json().catch(() => ({}));
+      if (!resp.ok) return { ok: false, error: result.error || `HTTP ${resp.status}`, case: "" };
+      input.value = "";
+      return { ok: true, error: "", case: result.case || "" };
+    } catch (e) {
+      return { ok: false, error: String(e && e.message ? e.message : e), case: "" };
+    }
+  };
+})();
@@ -0,0 +1,79 @@
+// Resumable chunked uploads (see MultiVol_Web3/uploads/resumable.py for the protocol).
+(function () {
+  const RETRIES = 5;
+
+  async function sha256Hex(buffer) {
+    // crypto.subtle only exists in secure contexts (https / localhost); the hash is optional then
+    if (!window.crypto || !window.crypto.subtle) return "";
+    const digest = await window.crypto.subtle.digest("SHA-256", buffer);
+    return Array.from(new Uint8Array(digest))
+      .map((b) => b.toString(16).padStart(2, "0"))
+      .join("");
+  }
+
+  async function putChunk(apiUrl, session, file, index) {
+    const start = index * session.chunk_size;
+    const end = Math.min(start + session.chunk_size, session.size);
+    const buffer = await file.slice(start, end).arrayBuffer();
+    const hash = await sha256Hex(buffer);
+    for (let attempt = 1; ; attempt++) {
+      try {
+        const resp = await fetch(`${apiUrl}/api/uploads/${session.id}?offset=${start}`, {
+          method: "PUT",
+          headers: hash ? { "X-Chunk-Sha256": hash } : {},
+          body: buffer,
+        });
+        if (resp.ok) return;
+        if (attempt >= RETRIES) throw new Error(`chunk ${index}: HTTP ${resp.status}`);
+      } catch (e) {
+        if (attempt >= RETRIES) throw e;
+      }
+      await new Promise((r) => setTimeout(r, 1000 * attempt));
+    }
+  }
+
+  // Files picked in the <input type=file> as plain objects, used to open/resume sessions
+  window.multivolSelectedFiles = function (inputId) {
+    const input = document.getElementById(inputId);
+    if (!input || !input.files) return [];
+    return Array.from(input.files).map((f) => ({
+      name: f.name,
+      size: f.size,
+      last_modified: f.lastModified,
+    }));
+  };
+
+  // Upload every missing chunk of `sessions`, `parallel` chunks at a time
+  async function upload(apiUrl, inputId, sessions, parallel) {
+    const input = document.getElementById(inputId);
+    const files = input && input.files ? Array.from(input.files) : [];
+    try {
+      for (const session of sessions) {
+        const file = files.find((f) => f.name === session.client_name && f.size === session.size);
+        if (!file) throw new Error(`${session.client_name} is no longer selected`);
+        // ask the server what it already has: an interrupted upload continues where it stopped
+        const status = await (await fetch(`${apiUrl}/api/uploads/${session.id}`)).json();
+        const have = new Set(status.received || []);
+        const todo = [];
+        for (let i = 0; i < status.chunks; i++) if (!have.has(i)) todo.push(i);
+        let next = 0;
+        const worker = async () => {
+          while (next < todo.length) {
+            const index = todo[next++];
+            await putChunk(apiUrl, session, file, index);
+          }
+        };
+        await Promise.all(Array.from({ length: Math.max(1, parallel) }, worker));
+      }
+      return { ok: true, error: "" };
+    } catch (e) {
+      return { ok: false, error: String(e && e.message ? e.message : e) };
+    }
+  }
+
+  // Starts the upload and returns at once: Reflex holds its event queue while a script's
+  // promise is pending. `onDone` (a queued event) gets the outcome.
+  window.multivolResumableUpload = function (apiUrl, inputId, sessions, parallel, onDone) {
+    upload(apiUrl, inputId, sessions, parallel).then(onDone);
+  };
+})();